@@ -9,19 +9,17 @@ import pyperclip
 
 from chart_utils import (
     detect_chart_candidates,
-    grouped_bar_chart,
-    stacked_bar_chart,
-    line_chart,
-    area_chart,
-    pie_chart,
-    donut_chart,
-    scatter_chart,
-    bubble_chart,
-    radar_chart,
-    treemap_chart,
+    swap_chart_axes,
+    build_chart,
+    polish_chart,
+    figure_from_json,
+    FigureCache,
     THEME_COLORS,
 )
 from insight_utils import generate_insights
+from data_utils import (SAMPLE_ROWS, LARGE_FILE_BYTES, UPLOAD_TYPES, WorkbookCache, content_hash,
+                        upload_format, read_csv_arrow, spool_upload, workbook_sheet_names,
+                        open_sheet_store)
 from export_utils import export_chart_as_png, copy_chart_text_to_clipboard
 
 st.set_page_config(
@@ -79,7 +77,7 @@ if st.session_state['show_help']:
     with st.expander("Welcome to ExcelInsight Pro (Click to close)", expanded=True):
         st.markdown("""
         **How to use ExcelInsight Pro:**
-        1. Upload your Excel file (max 20 MB)
+        1. Upload your Excel file (files over 20 MB are processed from disk)
         2. Select a sheet and review your data
         3. Choose a chart type and customize
         4. Use Slide Frame for export-ready visuals
@@ -265,6 +263,35 @@ chart_anim_style = '''
 '''
 st.markdown(chart_anim_style, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_workbook_cache():
+    """Parsed sheets shared across reruns and sessions."""
+    return WorkbookCache()
+
+def upload_digest(uploaded_file):
+    """Content hash of an upload, computed once per uploaded file."""
+    cached = st.session_state.get('upload_digest')
+    if cached and cached[0] == uploaded_file.file_id:
+        return cached[1]
+    digest = content_hash(uploaded_file.getbuffer())
+    st.session_state['upload_digest'] = (uploaded_file.file_id, digest)
+    return digest
+
+@st.cache_resource
+def get_figure_cache():
+    """Polished chart figures shared across reruns and sessions."""
+    return FigureCache()
+
+@st.cache_resource(max_entries=8)
+def get_sheet_store(digest, upload_path, sheet_name):
+    """On-disk store of one sheet of a large upload, converted once."""
+    return open_sheet_store(upload_path, digest, sheet_name)
+
+@st.cache_data(max_entries=32)
+def get_store_totals(digest, sheet_name, category, metrics, _store):
+    """Per-category totals from a sheet store, cached per column selection."""
+    return _store.aggregate(category, list(metrics))
+
 def main():
     st.markdown('<h1 class="main-header">ExcelInsight Pro</h1>', unsafe_allow_html=True)
     st.markdown('<div style="font-size:1.2em;margin-bottom:1.5em;color:#444;">Upload Excel. Customize your chart. Export insights in seconds.</div>', unsafe_allow_html=True)
@@ -275,43 +302,68 @@ def main():
     # Section: Upload Excel File
     st.markdown('<div class="section-title">📁 Upload Excel File</div>', unsafe_allow_html=True)
     uploaded_file = st.file_uploader(
-        "Choose an Excel file (.xls or .xlsx)",
-        type=['xls', 'xlsx'],
-        help="Maximum file size: 20 MB"
+        "Choose an Excel, CSV or Parquet file (.xls, .xlsx, .csv or .parquet)",
+        type=UPLOAD_TYPES,
+        help="Files over 20 MB are processed from disk, with charts showing totals per category"
     )
     
     if uploaded_file is not None:
-        file_size = len(uploaded_file.getvalue())
-        if file_size > 20 * 1024 * 1024:
-            st.error("❌ File size exceeds 20 MB limit. Please upload a smaller file.")
-            return
+        # Large files are spooled to disk and each sheet converted to Parquet in
+        # chunks, instead of being parsed into memory
+        out_of_core = uploaded_file.size > LARGE_FILE_BYTES
+        # CSV and Parquet are read through Arrow; Parquet is always memory-mapped
+        # from disk and only the columns the charts need are loaded
+        file_format = upload_format(uploaded_file.name)
+        use_store = out_of_core or file_format == 'parquet'
+        store = None
             
         try:
-            excel_file = pd.ExcelFile(uploaded_file)
-            sheet_names = excel_file.sheet_names
+            # Sheets are parsed once per file contents; reruns reuse the frames
+            workbook_cache = get_workbook_cache()
+            digest = upload_digest(uploaded_file)
+            if use_store:
+                upload_path = spool_upload(uploaded_file, digest)
+            if file_format != 'excel':
+                sheet_names = [uploaded_file.name]
+            elif out_of_core:
+                sheet_names = workbook_sheet_names(upload_path)
+            else:
+                sheet_names = workbook_cache.sheet_names(digest, uploaded_file.getbuffer())
             if not sheet_names:
                 st.error("❌ No sheets found in the Excel file.")
                 return
                 
             st.success(f"✅ File uploaded. Data looks good!")
             
-            # Section: Select Sheet
-            st.markdown('<div class="section-title">📄 Select Sheet</div>', unsafe_allow_html=True)
-            selected_sheet = st.selectbox(
-                "Choose a sheet to analyze:",
-                sheet_names,
-                index=0
-            )
+            if file_format == 'excel':
+                # Section: Select Sheet
+                st.markdown('<div class="section-title">📄 Select Sheet</div>', unsafe_allow_html=True)
+                selected_sheet = st.selectbox(
+                    "Choose a sheet to analyze:",
+                    sheet_names,
+                    index=0
+                )
+            else:
+                selected_sheet = sheet_names[0]
             
-            with st.spinner("Loading data..."):
+            # Header and first rows first, so the preview and chart detection
+            # don't wait for the whole sheet
+            with st.spinner("Converting large sheet..." if out_of_core else "Loading preview..."):
                 try:
-                    df = pd.read_excel(uploaded_file, sheet_name=selected_sheet)
+                    if use_store:
+                        store = get_sheet_store(digest, upload_path, selected_sheet)
+                        sample = store.head(SAMPLE_ROWS)
+                    elif file_format == 'csv':
+                        # The whole table: pyarrow's multithreaded reader is fast enough
+                        sample = workbook_cache.get((digest, 'csv'), lambda: read_csv_arrow(uploaded_file.getbuffer()))
+                    else:
+                        sample = workbook_cache.read_sheet(digest, uploaded_file.getbuffer(), selected_sheet, nrows=SAMPLE_ROWS)
                 except Exception as e:
                     st.error(f"❌ Error loading sheet '{selected_sheet}': {str(e)}")
                     return
             # Data upload clarity: auto-rename and prompt for NaN/empty headers
             renamed_cols = []
-            for col in df.columns:
+            for col in sample.columns:
                 # Defensive: ensure col is always a string
                 col_str = str(col) if not isinstance(col, str) else col
                 # Fix: use explicit checks, never use Series in boolean context
@@ -327,29 +379,74 @@ def main():
                     old_col = col
                     guess = 'Category' if (isinstance(col, str) and col.startswith('Unnamed')) or pd.isna(col) else 'Label'
                     new_col = st.text_input(f"Column '{old_col}' is ambiguous. Please name it:", value=guess, key=f"fixcol_{old_col}")
-                    df = df.rename(columns={col: new_col})
                     renamed_cols.append((old_col, new_col))
             # End fix
+            renames = dict(renamed_cols)
+            sample = sample.rename(columns=renames)
             if renamed_cols:
                 msg = "<br>".join([f"Renamed '{o}' → '{n}'" for o, n in renamed_cols])
                 st.info(f"{msg}", icon="ℹ️")
-            display_df = df.copy()
             
-            # Section: Data Overview
+            # Section: Data Overview (filled in once the full sheet is loaded)
             st.markdown('<div class="section-title">📊 Data Overview</div>', unsafe_allow_html=True)
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Rows", len(df))
-            with col2:
-                st.metric("Columns", len(df.columns))
-            with col3:
-                st.metric("Memory Usage", f"{df.memory_usage(deep=True).sum() / 1024:.1f} KB")
+            overview = st.container()
                 
             st.markdown("#### Preview of Data")
-            st.dataframe(display_df.head(10), use_container_width=True)
+            st.dataframe(sample.head(10), use_container_width=True)
 
             # Auto-detect chart candidates
-            chart_candidates = detect_chart_candidates(df)
+            chart_candidates = detect_chart_candidates(sample)
+
+            # Rest of the sheet, on demand for the overview, charts and insights
+            if out_of_core:
+                # Charts and insights use per-category totals of every metric
+                # any candidate chart needs; all candidates share one category
+                df = sample
+                if chart_candidates:
+                    original = {new: old for old, new in renames.items()}
+                    category = next(iter(chart_candidates.values()))["category"]
+                    metrics = list(dict.fromkeys(m for c in chart_candidates.values() for m in c["metrics"]))
+                    with st.spinner("Aggregating..."):
+                        df = get_store_totals(digest, selected_sheet, original.get(category, category),
+                                              tuple(original.get(m, m) for m in metrics), store).rename(columns=renames)
+                    st.caption(f"Large file: charts and takeaways show totals per {category} across all {store.num_rows:,} rows.")
+            elif store is not None:
+                # Only the columns the candidate charts use
+                df = sample
+                if chart_candidates:
+                    original = {new: old for old, new in renames.items()}
+                    columns = list(dict.fromkeys(original.get(c, c) for config in chart_candidates.values()
+                                                 for c in [config["category"]] + config["metrics"]))
+                    with st.spinner("Loading columns..."):
+                        df = store.read(columns).rename(columns=renames)
+            elif file_format == 'csv' or len(sample) < SAMPLE_ROWS:
+                df = sample
+            else:
+                with st.spinner("Loading full sheet..."):
+                    try:
+                        df = workbook_cache.read_sheet(digest, uploaded_file.getbuffer(), selected_sheet).rename(columns=renames)
+                    except Exception as e:
+                        st.error(f"❌ Error loading sheet '{selected_sheet}': {str(e)}")
+                        return
+                # Later rows can change a column's type (e.g. text below numbers)
+                if not df.dtypes.equals(sample.dtypes):
+                    chart_candidates = detect_chart_candidates(df)
+            with overview:
+                col1, col2, col3 = st.columns(3)
+                if store is not None:
+                    with col1:
+                        st.metric("Rows", store.num_rows)
+                    with col2:
+                        st.metric("Columns", len(store.columns))
+                    with col3:
+                        st.metric("On-Disk Size", f"{store.nbytes / 1024:.1f} KB")
+                else:
+                    with col1:
+                        st.metric("Rows", len(df))
+                    with col2:
+                        st.metric("Columns", len(df.columns))
+                    with col3:
+                        st.metric("Memory Usage", f"{df.memory_usage(deep=True).sum() / 1024:.1f} KB")
             
             if chart_candidates:
                 # Color palette selection
@@ -518,108 +615,26 @@ def main():
                 if swap_axes_enabled:
                     swap_axes = st.checkbox("Swap Axes: Show Metrics on X-Axis", value=False, key="swap_axes")
 
-                # --- Prepare data for chart based on axis swap ---
-                chart_cat_col = cat_col
-                chart_num_cols = num_cols
-                chart_df = df.copy()
-                chart_x_label = x_axis_label
-                chart_y_label = y_axis_label
-                chart_title_final = chart_title
-                if swap_axes:
-                    # Transpose: metrics become x-axis, categories become series
-                    chart_cat_col = "Metric"
-                    chart_num_cols = list(df[cat_col].unique())
-                    chart_df = pd.DataFrame({
-                        "Metric": num_cols
-                    })
-                    for cat in chart_num_cols:
-                        chart_df[cat] = [df[df[cat_col] == cat][metric].values[0] if not df[df[cat_col] == cat][metric].empty else None for metric in num_cols]
-                    chart_x_label = y_axis_label  # Swap labels
-                    chart_y_label = x_axis_label
-                    chart_title_final = f"{selected_chart} of {', '.join(chart_num_cols)} by Metric"
+                def build_figure():
+                    chart_df, chart_cat_col, chart_num_cols = df, cat_col, num_cols
+                    if swap_axes:
+                        # Transpose: metrics become x-axis, categories become series
+                        chart_df, chart_cat_col, chart_num_cols = swap_chart_axes(df, cat_col, num_cols)
+                    fig = build_chart(chart_df.copy(), selected_chart, chart_cat_col, chart_num_cols, selected_colors,
+                                      show_labels, rotate_labels, show_legend, show_percentage, limit_categories)
+                    return polish_chart(fig, deck_mode=deck_preview) if fig is not None else None
 
                 # --- Chart Preview (only one location at a time, with advanced visual polish) ---
                 with st.container():
                     st.markdown('<div class="chart-container" style="margin-bottom:2em;">', unsafe_allow_html=True)
-                    fig = None
-                    if selected_chart == "Grouped Bar":
-                        fig = grouped_bar_chart(chart_df, chart_cat_col, chart_num_cols, selected_colors, show_labels, rotate_labels, show_legend, limit_categories)
-                    elif selected_chart == "Stacked Bar":
-                        fig = stacked_bar_chart(chart_df, chart_cat_col, chart_num_cols, selected_colors, show_labels, rotate_labels, show_legend, limit_categories)
-                    elif selected_chart == "Line":
-                        fig = line_chart(chart_df, chart_cat_col, chart_num_cols, selected_colors, show_labels, show_legend, limit_categories)
-                    elif selected_chart == "Area":
-                        fig = area_chart(chart_df, chart_cat_col, chart_num_cols, selected_colors, show_labels, show_legend, limit_categories)
-                    elif selected_chart == "Pie":
-                        fig = pie_chart(chart_df, chart_cat_col, chart_num_cols, selected_colors, show_labels, show_percentage, limit_categories)
-                    elif selected_chart == "Donut":
-                        fig = donut_chart(chart_df, chart_cat_col, chart_num_cols, selected_colors, show_labels, show_percentage, limit_categories)
-                    elif selected_chart == "Scatter":
-                        fig = scatter_chart(chart_df, chart_cat_col, chart_num_cols, selected_colors, show_labels, show_legend, limit_categories)
-                    elif selected_chart == "Bubble":
-                        fig = bubble_chart(chart_df, chart_cat_col, chart_num_cols, selected_colors, show_labels, show_legend, limit_categories)
-                    elif selected_chart == "Radar":
-                        fig = radar_chart(chart_df, chart_cat_col, chart_num_cols, selected_colors, show_labels, show_legend, limit_categories)
-                    elif selected_chart == "Treemap":
-                        fig = treemap_chart(chart_df, chart_cat_col, chart_num_cols, selected_colors, show_labels, limit_categories)
-                    # --- Advanced visual polish ---
+                    # Polished figures are cached per data and chart options, so
+                    # reruns from unrelated widgets skip building them
+                    figure_key = ((digest, selected_sheet, len(df), tuple(df.columns)), selected_chart, cat_col,
+                                  tuple(num_cols), tuple(selected_colors), show_labels, show_legend, rotate_labels,
+                                  show_percentage, limit_categories, swap_axes, deck_preview)
+                    fig_json = get_figure_cache().get(figure_key, build_figure)
+                    fig = figure_from_json(fig_json) if fig_json is not None else None
                     if fig is not None:
-                        # Universal layout polish
-                        fig.update_layout(
-                            font=dict(family="Inter, Arial, sans-serif", size=18, color="#222"),
-                            title=dict(font=dict(size=28, color="#1a1a1a", family="Inter, Arial, sans-serif"), x=0.01, xanchor="left"),
-                            plot_bgcolor="white",
-                            paper_bgcolor="white",
-                            margin=dict(l=80, r=40, t=80, b=80),
-                            legend=dict(
-                                orientation="h",
-                                yanchor="bottom",
-                                y=1.02,
-                                xanchor="right",
-                                x=1,
-                                font=dict(size=17, color="#222"),
-                                bgcolor="rgba(0,0,0,0)",
-                                borderwidth=0
-                            ),
-                            xaxis=dict(
-                                showgrid=True,
-                                gridcolor="#e5e5e5",
-                                linecolor="#222",
-                                linewidth=1.2,
-                                ticks="outside",
-                                ticklen=6,
-                                tickcolor="#222",
-                                mirror=True,
-                                tickfont=dict(size=16),
-                                title_font=dict(size=20, color="#222"),
-                                automargin=True
-                            ),
-                            yaxis=dict(
-                                showgrid=True,
-                                gridcolor="#e5e5e5",
-                                linecolor="#222",
-                                linewidth=1.2,
-                                ticks="outside",
-                                ticklen=6,
-                                tickcolor="#222",
-                                mirror=True,
-                                tickfont=dict(size=16),
-                                title_font=dict(size=20, color="#222"),
-                                automargin=True
-                            ),
-                            hovermode="x unified"
-                        )
-                        # Slide mode: boost font and chart size
-                        if deck_preview:
-                            fig.update_layout(
-                                width=1280,
-                                height=720,
-                                font=dict(size=22),
-                                title=dict(font=dict(size=36)),
-                                legend=dict(font=dict(size=20)),
-                                xaxis=dict(tickfont=dict(size=20), title_font=dict(size=24)),
-                                yaxis=dict(tickfont=dict(size=20), title_font=dict(size=24)),
-                            )
                         # Add note for best export quality
                         st.caption("For best export quality, use Slide Frame mode and PNG download.")
                     # Only show in one place: slide frame or normal
@@ -731,7 +746,7 @@ def main():
     else:
         st.markdown("""
         ### 🚀 How to Use ExcelInsight Pro
-        1. **Upload** your Excel file (.xls or .xlsx) - max 20 MB
+        1. **Upload** your Excel file (.xls or .xlsx) - large files supported
         2. **Select** a sheet to analyze
         3. **Choose** from 10+ chart types
         4. **Customize** with themes and settings
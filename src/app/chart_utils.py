@@ -1,3 +1,6 @@
+import json
+import threading
+from collections import OrderedDict
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
@@ -34,7 +37,8 @@ def detect_chart_candidates(df):
     num_cols = []
     
     for col in columns:
-        if df[col].dtype == object or col.lower().startswith("unnamed"):
+        # Text columns may be object, pandas string or Arrow string dtype
+        if df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype) or col.lower().startswith("unnamed"):
             cat_cols.append(col)
         elif pd.api.types.is_numeric_dtype(df[col]):
             num_cols.append(col)
@@ -548,4 +552,201 @@ def suggest_chart_types(df, category_col, metric_cols):
     elif n_metrics == 1:
         return ["Pie", "Donut", "Treemap", "Line", "Area"]
     else:
-        return [] 
\ No newline at end of file
+        return []
+
+def swap_chart_axes(df, cat_col, num_cols):
+    """
+    Transpose chart data so metrics become the x-axis and categories the series.
+
+    Args:
+        df: Chart data with one row per category
+        cat_col: Category column
+        num_cols: Metric columns
+
+    Returns:
+        tuple: (transposed frame, its category column, its series columns)
+    """
+    series = list(df[cat_col].unique())
+    swapped = pd.DataFrame({"Metric": num_cols})
+    for cat in series:
+        rows = df[df[cat_col] == cat]
+        swapped[cat] = [rows[metric].values[0] if not rows[metric].empty else None for metric in num_cols]
+    return swapped, "Metric", series
+
+def build_chart(df, chart_type, cat_col, num_cols, colors=None, show_labels=False, rotate_labels=False,
+                show_legend=True, show_percentage=False, limit_categories=None):
+    """
+    Figure for a chart type, or None if the type is unknown.
+
+    Args:
+        df: Chart data
+        chart_type: Chart name as used by detect_chart_candidates
+        cat_col: Category column
+        num_cols: Metric columns
+        colors, show_labels, rotate_labels, show_legend, show_percentage,
+            limit_categories: Options for the chart function; each chart
+            type uses the ones it supports
+
+    Returns:
+        go.Figure or None
+    """
+    if chart_type == "Grouped Bar":
+        return grouped_bar_chart(df, cat_col, num_cols, colors, show_labels, rotate_labels, show_legend, limit_categories)
+    elif chart_type == "Stacked Bar":
+        return stacked_bar_chart(df, cat_col, num_cols, colors, show_labels, rotate_labels, show_legend, limit_categories)
+    elif chart_type == "Line":
+        return line_chart(df, cat_col, num_cols, colors, show_labels, show_legend, limit_categories)
+    elif chart_type == "Area":
+        return area_chart(df, cat_col, num_cols, colors, show_labels, show_legend, limit_categories)
+    elif chart_type == "Pie":
+        return pie_chart(df, cat_col, num_cols, colors, show_labels, show_percentage, limit_categories)
+    elif chart_type == "Donut":
+        return donut_chart(df, cat_col, num_cols, colors, show_labels, show_percentage, limit_categories)
+    elif chart_type == "Scatter":
+        return scatter_chart(df, cat_col, num_cols, colors, show_labels, show_legend, limit_categories)
+    elif chart_type == "Bubble":
+        return bubble_chart(df, cat_col, num_cols, colors, show_labels, show_legend, limit_categories)
+    elif chart_type == "Radar":
+        return radar_chart(df, cat_col, num_cols, colors, show_labels, show_legend, limit_categories)
+    elif chart_type == "Treemap":
+        return treemap_chart(df, cat_col, num_cols, colors, show_labels, limit_categories)
+    return None
+
+def polish_chart(fig, deck_mode=False):
+    """
+    Apply the app's presentation styling to a figure in place.
+
+    Args:
+        fig: Figure from build_chart
+        deck_mode: Size and fonts for the 16:9 slide frame
+
+    Returns:
+        go.Figure: The same figure
+    """
+    # Universal layout polish
+    fig.update_layout(
+        font=dict(family="Inter, Arial, sans-serif", size=18, color="#222"),
+        title=dict(font=dict(size=28, color="#1a1a1a", family="Inter, Arial, sans-serif"), x=0.01, xanchor="left"),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        margin=dict(l=80, r=40, t=80, b=80),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(size=17, color="#222"),
+            bgcolor="rgba(0,0,0,0)",
+            borderwidth=0
+        ),
+        xaxis=dict(
+            showgrid=True,
+            gridcolor="#e5e5e5",
+            linecolor="#222",
+            linewidth=1.2,
+            ticks="outside",
+            ticklen=6,
+            tickcolor="#222",
+            mirror=True,
+            tickfont=dict(size=16),
+            title_font=dict(size=20, color="#222"),
+            automargin=True
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor="#e5e5e5",
+            linecolor="#222",
+            linewidth=1.2,
+            ticks="outside",
+            ticklen=6,
+            tickcolor="#222",
+            mirror=True,
+            tickfont=dict(size=16),
+            title_font=dict(size=20, color="#222"),
+            automargin=True
+        ),
+        hovermode="x unified"
+    )
+    # Slide mode: boost font and chart size
+    if deck_mode:
+        fig.update_layout(
+            width=1280,
+            height=720,
+            font=dict(size=22),
+            title=dict(font=dict(size=36)),
+            legend=dict(font=dict(size=20)),
+            xaxis=dict(tickfont=dict(size=20), title_font=dict(size=24)),
+            yaxis=dict(tickfont=dict(size=20), title_font=dict(size=24)),
+        )
+    return fig
+
+def figure_from_json(fig_json):
+    """
+    Figure from JSON written by FigureCache.
+
+    The JSON comes from an already validated figure, so it is loaded without
+    re-validating every property, which is most of the cost of building one.
+
+    Args:
+        fig_json: Figure JSON
+
+    Returns:
+        go.Figure
+    """
+    return go.Figure(json.loads(fig_json), _validate=False)
+
+class FigureCache:
+    """
+    Polished chart figures as JSON, kept in an LRU of at most max_entries.
+
+    Keys should identify the chart data (e.g. the upload's content hash and
+    sheet) and every option that changes the figure, so reruns caused by
+    unrelated widgets reuse the figure instead of rebuilding and restyling
+    it. The cache is thread-safe so one instance can be shared across
+    Streamlit sessions.
+
+    Args:
+        max_entries: Number of figures to keep
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Figure JSON for a key, calling build only on a cache miss.
+
+        Args:
+            key: Hashable description of the chart data and options
+            build: Returns the polished go.Figure, or None if there is no chart
+
+        Returns:
+            str: Figure JSON, or None if build returned None
+        """
+        with self._lock:
+            if key in self._figures:
+                self.hits += 1
+                self._figures.move_to_end(key)
+                return self._figures[key]
+            self.misses += 1
+        fig = build()
+        fig_json = fig.to_json() if fig is not None else None
+        with self._lock:
+            self._figures[key] = fig_json
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+        return fig_json
+
+    def clear(self):
+        """Drop every cached figure."""
+        with self._lock:
+            self._figures.clear()
+
+    def __len__(self):
+        return len(self._figures)
@@ -0,0 +1,582 @@
+import hashlib
+import importlib.util
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+import pandas as pd
+
+# Rows read for the preview and chart detection before the full sheet loads
+SAMPLE_ROWS = 1000
+# Accepted upload extensions; CSV and Parquet are single-table "sheets"
+UPLOAD_TYPES = ['xls', 'xlsx', 'csv', 'parquet']
+# Uploads above this size are processed out of core from an on-disk store
+LARGE_FILE_BYTES = 20 * 1024 * 1024
+# Rows converted per Parquet row group when building a sheet store
+STORE_CHUNK_ROWS = 50_000
+STORE_ROOT = os.path.join(tempfile.gettempdir(), 'excelinsight')
+# Disk budget for spooled uploads and their sheet stores under STORE_ROOT
+STORE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# Upload directories used this recently are never pruned, so another session
+# can finish spooling or converting into them
+STORE_GRACE_SECONDS = 5 * 60
+
+def content_hash(data):
+    """
+    Fingerprint of uploaded file contents.
+
+    Args:
+        data: File contents as bytes or a buffer (e.g. UploadedFile.getbuffer())
+
+    Returns:
+        str: Hex digest identifying the contents
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def calamine_available():
+    """Whether pandas can use the calamine engine (python-calamine, pandas 2.2+)."""
+    major, minor = (int(part) for part in pd.__version__.split('.')[:2])
+    return (major, minor) >= (2, 2) and importlib.util.find_spec('python_calamine') is not None
+
+def excel_engine(data, streaming=False):
+    """
+    Pick the reader backend for a workbook.
+
+    openpyxl in read-only mode streams .xlsx rows and stops after the rows
+    requested, so it is the fastest way to a preview; calamine parses whole
+    sheets several times faster than openpyxl, so it loads full sheets when
+    installed.
+
+    Args:
+        data: Workbook contents as bytes or a buffer (e.g. UploadedFile.getbuffer())
+        streaming: Whether only the first rows of a sheet are needed
+
+    Returns:
+        str: Engine for pd.read_excel, or None for the pandas default
+    """
+    is_xlsx = data[:4] == b'PK\x03\x04'
+    if streaming and is_xlsx:
+        return 'openpyxl'
+    if calamine_available():
+        return 'calamine'
+    return None
+
+def read_excel_sheet(data, sheet_name, nrows=None):
+    """
+    Read one sheet, or just its header and first rows, with the best backend.
+
+    Args:
+        data: Workbook contents as bytes or a buffer (e.g. UploadedFile.getbuffer())
+        sheet_name: Sheet to read
+        nrows: Number of data rows to read, or None for the whole sheet
+
+    Returns:
+        pd.DataFrame: Sheet contents
+    """
+    engine = excel_engine(data, streaming=nrows is not None)
+    return pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, nrows=nrows, engine=engine)
+
+def upload_format(name):
+    """
+    Format of an upload from its file name.
+
+    Args:
+        name: File name
+
+    Returns:
+        str: 'excel', 'csv' or 'parquet'
+    """
+    extension = os.path.splitext(name)[1].lower()
+    return {'.csv': 'csv', '.parquet': 'parquet'}.get(extension, 'excel')
+
+def read_csv_arrow(data):
+    """
+    Parse CSV with pyarrow's multithreaded reader into an Arrow-backed frame.
+
+    Args:
+        data: CSV contents as bytes or a buffer
+
+    Returns:
+        pd.DataFrame: Frame with pd.ArrowDtype columns sharing the Arrow buffers
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pv
+    table = pv.read_csv(pa.BufferReader(data), read_options=pv.ReadOptions(use_threads=True))
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+def frame_nbytes(df):
+    """Approximate memory held by a DataFrame, including object columns."""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+class WorkbookCache:
+    """
+    Parsed workbook sheets keyed by (content hash, sheet), kept in an LRU
+    bounded by the total bytes of the cached frames.
+
+    Each sheet is parsed at most once while it stays cached, and only when it
+    is first requested. The cache is thread-safe so one instance can be shared
+    across Streamlit sessions.
+
+    Args:
+        max_bytes: Memory budget for cached frames
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()
+        self._sheet_names = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sheet_names(self, digest, data):
+        """
+        Sheet names of a workbook, read once per content hash.
+
+        Args:
+            digest: content_hash of data
+            data: Workbook contents as bytes or a buffer (e.g. UploadedFile.getbuffer())
+
+        Returns:
+            list: Sheet names in workbook order
+        """
+        with self._lock:
+            if digest in self._sheet_names:
+                self._sheet_names.move_to_end(digest)
+                return list(self._sheet_names[digest])
+        with pd.ExcelFile(io.BytesIO(data), engine=excel_engine(data)) as excel_file:
+            names = list(excel_file.sheet_names)
+        with self._lock:
+            self._sheet_names[digest] = names
+            # Names are tiny; keep as many workbooks as could have frames cached
+            while len(self._sheet_names) > 256:
+                self._sheet_names.popitem(last=False)
+        return list(names)
+
+    def read_sheet(self, digest, data, sheet_name, nrows=None):
+        """
+        One parsed sheet of a workbook, parsing it only on a cache miss.
+
+        With nrows, only the header and first rows are read (or sliced from
+        the full sheet if that is already cached), which is much faster on
+        large sheets.
+
+        Args:
+            digest: content_hash of data
+            data: Workbook contents as bytes or a buffer (e.g. UploadedFile.getbuffer())
+            sheet_name: Sheet to read
+            nrows: Number of data rows to read, or None for the whole sheet
+
+        Returns:
+            pd.DataFrame: Shallow copy of the cached frame (rename or add columns
+                freely, but do not modify values in place)
+        """
+        if nrows is not None:
+            with self._lock:
+                if (digest, sheet_name) in self._frames:
+                    self.hits += 1
+                    return self._frames[(digest, sheet_name)][0].head(nrows)
+        key = (digest, sheet_name) if nrows is None else (digest, sheet_name, nrows)
+        return self.get(key, lambda: read_excel_sheet(data, sheet_name, nrows))
+
+    def get(self, key, load):
+        """
+        Cached frame for a key, calling load() to produce it on a miss.
+
+        Args:
+            key: Cache key, starting with the content hash
+            load: Function returning the frame
+
+        Returns:
+            pd.DataFrame: Shallow copy of the cached frame
+        """
+        with self._lock:
+            if key in self._frames:
+                self.hits += 1
+                self._frames.move_to_end(key)
+                return self._frames[key][0].copy(deep=False)
+            self.misses += 1
+        df = load()
+        self.put(key, df)
+        return df.copy(deep=False)
+
+    def put(self, key, df):
+        """
+        Cache a frame, evicting least recently used frames over max_bytes.
+
+        Frames larger than the whole budget are not cached.
+
+        Args:
+            key: Cache key, usually (content hash, sheet name[, nrows])
+            df: Frame to cache
+        """
+        size = frame_nbytes(df)
+        with self._lock:
+            if key in self._frames:
+                self.nbytes -= self._frames.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._frames[key] = (df, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._frames.popitem(last=False)
+                self.nbytes -= evicted
+
+    def clear(self):
+        """Drop every cached frame and sheet list."""
+        with self._lock:
+            self._frames.clear()
+            self._sheet_names.clear()
+            self.nbytes = 0
+
+def store_dir(digest):
+    """
+    Directory holding the on-disk files of one upload.
+
+    Args:
+        digest: content_hash of the upload
+
+    Returns:
+        str: Existing directory path
+    """
+    path = os.path.join(STORE_ROOT, digest)
+    os.makedirs(path, exist_ok=True)
+    # The directory's mtime marks when the upload was last used, for prune_stores
+    os.utime(path)
+    return path
+
+def _dir_usage(path):
+    total, writing = 0, False
+    for root, _, files in os.walk(path):
+        for name in files:
+            # A .part file is a spool or conversion still in progress
+            writing = writing or name.endswith('.part')
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total, writing
+
+def prune_stores(keep=(), max_bytes=STORE_MAX_BYTES):
+    """
+    Delete the least recently used upload directories under STORE_ROOT until
+    the rest fit in the disk budget.
+
+    Directories used within the last STORE_GRACE_SECONDS, or holding a .part
+    file, belong to uploads another session may still be writing and are
+    skipped. Stores already open elsewhere keep working on POSIX systems, since
+    their files stay memory-mapped; a deleted upload is spooled and converted
+    again if it is used later.
+
+    Args:
+        keep: Digests whose directories are never deleted (the uploads in use)
+        max_bytes: Disk budget for STORE_ROOT
+
+    Returns:
+        int: Bytes freed
+    """
+    try:
+        entries = [os.path.join(STORE_ROOT, name) for name in os.listdir(STORE_ROOT)]
+    except FileNotFoundError:
+        return 0
+    dirs = []
+    for path in entries:
+        try:
+            dirs.append((os.path.getmtime(path), path, *_dir_usage(path)))
+        except OSError:
+            pass
+    total = sum(nbytes for _, _, nbytes, _ in dirs)
+    cutoff = time.time() - STORE_GRACE_SECONDS
+    freed = 0
+    for mtime, path, nbytes, writing in sorted(dirs):
+        if total - freed <= max_bytes:
+            break
+        if os.path.basename(path) in keep or writing or mtime > cutoff:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        freed += nbytes
+    return freed
+
+def spool_upload(uploaded_file, digest):
+    """
+    Copy an upload to a temp file in 1 MB blocks, once per file contents.
+
+    Args:
+        uploaded_file: Streamlit UploadedFile (or any binary file object)
+        digest: content_hash of the upload
+
+    Returns:
+        str: Path of the spooled file
+    """
+    extension = os.path.splitext(getattr(uploaded_file, 'name', ''))[1].lower()
+    path = os.path.join(store_dir(digest), 'upload' + extension)
+    if not os.path.exists(path):
+        uploaded_file.seek(0)
+        partial = path + '.part'
+        with open(partial, 'wb') as out:
+            shutil.copyfileobj(uploaded_file, out, 1 << 20)
+        os.replace(partial, path)
+        prune_stores(keep=(digest,))
+    return path
+
+def _is_xlsx(path):
+    with open(path, 'rb') as f:
+        return f.read(4) == b'PK\x03\x04'
+
+def workbook_sheet_names(path):
+    """
+    Sheet names of a workbook on disk, without parsing any sheet.
+
+    Args:
+        path: Workbook path
+
+    Returns:
+        list: Sheet names in workbook order
+    """
+    if _is_xlsx(path):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+    with pd.ExcelFile(path) as excel_file:
+        return list(excel_file.sheet_names)
+
+def _column_names(header):
+    # Header cells to unique string names, following pandas' read_excel
+    # conventions ("Unnamed: i" for blanks, ".1", ".2" suffixes for duplicates)
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def _column_kind(values):
+    # 'number', 'datetime' or 'text' from a column's non-empty cell values
+    present = [v for v in values if v is not None and v == v]
+    if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return 'number'
+    if present and all(isinstance(v, (datetime, date)) for v in present):
+        return 'datetime'
+    return 'text'
+
+def _typed_chunk(rows, names, kinds):
+    # DataFrame of one chunk with every column coerced to its store type
+    chunk = pd.DataFrame.from_records(rows, columns=names)
+    for name in names:
+        if kinds[name] == 'number':
+            chunk[name] = pd.to_numeric(chunk[name], errors='coerce').astype('float64')
+        elif kinds[name] == 'datetime':
+            chunk[name] = pd.to_datetime(chunk[name], errors='coerce')
+        else:
+            chunk[name] = chunk[name].map(lambda v: None if v is None or v != v else str(v)).astype(object)
+    return chunk
+
+def _iter_sheet_rows(path, sheet_name):
+    # Cell values row by row; .xlsx is streamed, legacy .xls is read whole
+    if _is_xlsx(path):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheet = workbook[sheet_name]
+            sheet.reset_dimensions()
+            yield from sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        df = pd.read_excel(path, sheet_name=sheet_name, header=None)
+        for row in df.itertuples(index=False):
+            yield tuple(None if pd.isna(v) else v for v in row)
+
+def csv_to_parquet(path, out_path):
+    """
+    Convert a CSV file to Parquet block by block with pyarrow's streaming reader.
+
+    Column types are inferred from the first block.
+
+    Args:
+        path: CSV path
+        out_path: Parquet file to write
+
+    Returns:
+        int: Number of data rows written
+    """
+    import pyarrow.csv as pv
+    import pyarrow.parquet as pq
+
+    reader = pv.open_csv(path, read_options=pv.ReadOptions(block_size=16 << 20))
+    partial = out_path + '.part'
+    n_rows = 0
+    with pq.ParquetWriter(partial, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            n_rows += batch.num_rows
+    os.replace(partial, out_path)
+    return n_rows
+
+def sheet_to_parquet(path, sheet_name, out_path, chunk_rows=STORE_CHUNK_ROWS):
+    """
+    Convert one sheet to Parquet chunk by chunk, holding one chunk in memory.
+
+    Column types are taken from the first chunk: numeric columns become
+    float64 (later non-numeric cells become missing), date columns
+    timestamps and everything else text. Empty rows are skipped.
+
+    Args:
+        path: Workbook path
+        sheet_name: Sheet to convert
+        out_path: Parquet file to write
+        chunk_rows: Rows per chunk and Parquet row group
+
+    Returns:
+        int: Number of data rows written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = _iter_sheet_rows(path, sheet_name)
+    names = _column_names(next(rows, ()))
+    width = len(names)
+    partial = out_path + '.part'
+    writer, kinds, chunk, n_rows = None, None, [], 0
+
+    def flush():
+        nonlocal writer, kinds
+        if kinds is None:
+            kinds = {name: _column_kind([row[i] for row in chunk]) for i, name in enumerate(names)}
+        table = pa.Table.from_pandas(_typed_chunk(chunk, names, kinds), preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(partial, table.schema)
+        writer.write_table(table.cast(writer.schema))
+
+    try:
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            chunk.append(row)
+            if len(chunk) == chunk_rows:
+                flush()
+                n_rows += len(chunk)
+                chunk = []
+        if chunk or writer is None:
+            flush()
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(partial, out_path)
+    return n_rows
+
+class SheetStore:
+    """
+    One sheet as an on-disk Parquet file, read a few columns or rows at a
+    time through a memory map into Arrow-backed frames.
+
+    Args:
+        path: Parquet file (an upload, or written by sheet_to_parquet or
+            csv_to_parquet)
+    """
+
+    def __init__(self, path):
+        import pyarrow.parquet as pq
+        self.path = path
+        self._file = pq.ParquetFile(path, memory_map=True)
+        self.columns = list(self._file.schema_arrow.names)
+        self.num_rows = self._file.metadata.num_rows
+        self.nbytes = os.path.getsize(path)
+
+    def head(self, n=SAMPLE_ROWS):
+        """
+        First rows of the sheet, reading only the row groups needed.
+
+        Args:
+            n: Number of rows
+
+        Returns:
+            pd.DataFrame: Up to n rows
+        """
+        batches, remaining = [], n
+        for batch in self._file.iter_batches(batch_size=min(max(n, 1), STORE_CHUNK_ROWS)):
+            batches.append(batch.slice(0, remaining).to_pandas(types_mapper=pd.ArrowDtype))
+            remaining -= min(remaining, batch.num_rows)
+            if remaining == 0:
+                break
+        if not batches:
+            return self._file.schema_arrow.empty_table().to_pandas(types_mapper=pd.ArrowDtype)
+        return pd.concat(batches, ignore_index=True)
+
+    def read(self, columns=None):
+        """
+        Whole columns of the sheet; only the requested columns are read.
+
+        Args:
+            columns: Columns to read, or None for all
+
+        Returns:
+            pd.DataFrame: Arrow-backed frame
+        """
+        table = self._file.read(columns=None if columns is None else list(columns))
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    def aggregate(self, category, metrics):
+        """
+        Totals of the metric columns per category value over the whole sheet.
+
+        Only the category and metric columns are read, one row group at a
+        time, so memory grows with the number of categories, not rows.
+
+        Args:
+            category: Category column
+            metrics: Numeric columns to sum
+
+        Returns:
+            pd.DataFrame: One row per category, in order of first appearance
+        """
+        partials = []
+        for batch in self._file.iter_batches(columns=[category] + list(metrics)):
+            chunk = batch.to_pandas(types_mapper=pd.ArrowDtype)
+            partials.append(chunk.groupby(category, sort=False)[list(metrics)].sum())
+        if not partials:
+            return pd.DataFrame(columns=[category] + list(metrics))
+        totals = pd.concat(partials).groupby(level=0, sort=False).sum()
+        return totals.rename_axis(category).reset_index()
+
+def open_sheet_store(path, digest, sheet_name):
+    """
+    Sheet store of one sheet of a spooled upload, converting it on first use.
+
+    Parquet uploads are memory-mapped as they are; CSV files and workbook
+    sheets are converted to Parquet next to the spooled file.
+
+    Args:
+        path: Spooled upload path
+        digest: content_hash of the upload
+        sheet_name: Sheet to open (ignored for CSV and Parquet)
+
+    Returns:
+        SheetStore: Store of the sheet
+    """
+    file_format = upload_format(path)
+    if file_format == 'parquet':
+        return SheetStore(path)
+    sheet_key = hashlib.blake2b(str(sheet_name).encode(), digest_size=8).hexdigest()
+    parquet_path = os.path.join(store_dir(digest), f"sheet-{sheet_key}.parquet")
+    if not os.path.exists(parquet_path):
+        if file_format == 'csv':
+            csv_to_parquet(path, parquet_path)
+        else:
+            sheet_to_parquet(path, sheet_name, parquet_path)
+        prune_stores(keep=(digest,))
+    return SheetStore(parquet_path)
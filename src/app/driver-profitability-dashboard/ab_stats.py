@@ -0,0 +1,183 @@
+"""
+A/B Test Statistics for Driver Profitability Dashboard
+
+Two-sample tests, lift, confidence intervals and power from per-group
+(n, mean, M2) accumulators instead of raw rows. Accumulators can be fed in
+batches and merged across partitions, so a test costs the same however many
+trips are behind it.
+"""
+
+import numpy as np
+from scipy.special import stdtr, stdtrit
+from scipy.stats import nct
+
+class GroupStats:
+    """
+    Count, mean and sum of squared deviations from the mean (M2) of one group
+
+    Args:
+        n (int): Number of observations
+        mean (float): Mean of the observations
+        m2 (float): Sum of squared deviations from the mean
+    """
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    @classmethod
+    def from_values(cls, values):
+        """
+        Accumulator over an array of observations
+
+        Args:
+            values (array-like): Observations
+
+        Returns:
+            GroupStats: Statistics of the observations
+        """
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return cls()
+        mean = values.mean()
+        return cls(len(values), mean, float(np.sum((values - mean) ** 2)))
+
+    @classmethod
+    def from_sums(cls, n, total, sumsq):
+        """
+        Accumulator from a count, sum and sum of squares (e.g. cube cells)
+
+        Args:
+            n (int): Number of observations
+            total (float): Sum of the observations
+            sumsq (float): Sum of the squared observations
+
+        Returns:
+            GroupStats: Statistics of the observations
+        """
+        if n == 0:
+            return cls()
+        mean = total / n
+        return cls(n, mean, max(sumsq - total * mean, 0.0))
+
+    def update(self, values):
+        """
+        Add a batch of observations in place
+
+        Args:
+            values (array-like): New observations
+
+        Returns:
+            GroupStats: self
+        """
+        merged = self.merge(GroupStats.from_values(values))
+        self.n, self.mean, self.m2 = merged.n, merged.mean, merged.m2
+        return self
+
+    def merge(self, other):
+        """
+        Combine with the statistics of another partition (Chan et al.)
+
+        Args:
+            other (GroupStats): Statistics of disjoint observations
+
+        Returns:
+            GroupStats: Statistics of both partitions together
+        """
+        n = self.n + other.n
+        if n == 0:
+            return GroupStats()
+        delta = other.mean - self.mean
+        mean = self.mean + delta * other.n / n
+        m2 = self.m2 + other.m2 + delta ** 2 * self.n * other.n / n
+        return GroupStats(n, mean, m2)
+
+    __add__ = merge
+
+    def var(self, ddof=1):
+        """
+        Variance of the observations
+
+        Args:
+            ddof (int): Delta degrees of freedom
+
+        Returns:
+            float: M2 / (n - ddof), NaN with too few observations
+        """
+        return self.m2 / (self.n - ddof) if self.n > ddof else float('nan')
+
+    def __repr__(self):
+        return f"GroupStats(n={self.n}, mean={self.mean:.4g}, m2={self.m2:.4g})"
+
+def _standard_error(control, treatment, equal_var):
+    # Standard error of the difference in means and its degrees of freedom
+    if equal_var:
+        dof = control.n + treatment.n - 2
+        pooled_var = (control.m2 + treatment.m2) / dof if dof > 0 else float('nan')
+        return np.sqrt(pooled_var * (1 / control.n + 1 / treatment.n)), dof
+    se2_c, se2_t = control.var() / control.n, treatment.var() / treatment.n
+    dof = (se2_c + se2_t) ** 2 / (se2_c ** 2 / (control.n - 1) + se2_t ** 2 / (treatment.n - 1))
+    return np.sqrt(se2_c + se2_t), dof
+
+def t_test(control, treatment, equal_var=False, alpha=0.05):
+    """
+    Two-sided two-sample t-test of treatment against control
+
+    Args:
+        control (GroupStats): Control group statistics
+        treatment (GroupStats): Treatment group statistics
+        equal_var (bool): Pooled-variance (Student) test if True, Welch otherwise
+        alpha (float): Significance level for the confidence interval
+
+    Returns:
+        dict: control_mean, treatment_mean, diff, lift (% of control),
+            se, tstat, dof, pval and the (1 - alpha) CI of diff
+    """
+    if control.n < 2 or treatment.n < 2:
+        nan = float('nan')
+        return {'control_mean': control.mean if control.n else nan,
+                'treatment_mean': treatment.mean if treatment.n else nan,
+                'diff': nan, 'lift': nan, 'se': nan, 'tstat': nan, 'dof': nan,
+                'pval': nan, 'ci_low': nan, 'ci_high': nan}
+    diff = treatment.mean - control.mean
+    se, dof = _standard_error(control, treatment, equal_var)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tstat = diff / se
+        lift = diff / control.mean * 100
+    margin = stdtrit(dof, 1 - alpha / 2) * se
+    return {
+        'control_mean': control.mean,
+        'treatment_mean': treatment.mean,
+        'diff': diff,
+        'lift': lift,
+        'se': se,
+        'tstat': tstat,
+        'dof': dof,
+        'pval': 2 * stdtr(dof, -np.abs(tstat)),
+        'ci_low': diff - margin,
+        'ci_high': diff + margin,
+    }
+
+def power(control, treatment, effect=None, equal_var=False, alpha=0.05):
+    """
+    Probability that the two-sided t-test detects an effect at these sample sizes
+
+    Args:
+        control (GroupStats): Control group statistics
+        treatment (GroupStats): Treatment group statistics
+        effect (float): True difference in means to detect (default: observed)
+        equal_var (bool): Pooled-variance test if True, Welch otherwise
+        alpha (float): Significance level
+
+    Returns:
+        float: Power of the test
+    """
+    if control.n < 2 or treatment.n < 2:
+        return float('nan')
+    if effect is None:
+        effect = treatment.mean - control.mean
+    se, dof = _standard_error(control, treatment, equal_var)
+    ncp = effect / se
+    crit = stdtrit(dof, 1 - alpha / 2)
+    return float(nct.sf(crit, dof, ncp) + nct.cdf(-crit, dof, ncp))
@@ -3,151 +3,205 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-import datetime
-from datetime import timedelta
 import random
+import os
+import trip_engine
+from trip_engine import (SURGE_PRICING, DRIVER_TYPES, AB_GROUPS, load_trip_data, trip_partitions,
+                         trip_schema, trip_format, trip_files, PARTITIONS_KEY)
+from trip_cube import TRIP_BUCKETS, build_cube, select_cells, cell_mean, ab_test
+from trip_features import FeatureCache
+from filter_index import BitmapIndex
+from what_if import cost_grid, sweep, sweep_rollup
 
 # --- Data generation and expense calculation helpers ---
 @st.cache_data
 def generate_trip_data(n_trips=1000):
-    zones = {
-        'Downtown': {'base_fare': 15, 'demand_factor': 1.2, 'surge_multiplier': 1.3},
-        'Etobicoke': {'base_fare': 12, 'demand_factor': 0.8, 'surge_multiplier': 1.1},
-        'North York': {'base_fare': 14, 'demand_factor': 1.0, 'surge_multiplier': 1.2},
-        'Scarborough': {'base_fare': 13, 'demand_factor': 0.9, 'surge_multiplier': 1.0},
-        'Mississauga': {'base_fare': 11, 'demand_factor': 0.7, 'surge_multiplier': 0.9},
-        'Brampton': {'base_fare': 10, 'demand_factor': 0.6, 'surge_multiplier': 0.8}
-    }
-    np.random.seed(42)
-    trip_ids = [f"TRIP_{i:06d}" for i in range(1, n_trips + 1)]
-    driver_ids = [f"DRIVER_{np.random.randint(1000, 9999)}" for _ in range(n_trips)]
-    pickup_zones = np.random.choice(list(zones.keys()), n_trips, p=[0.3, 0.15, 0.2, 0.15, 0.1, 0.1])
-    dropoff_zones = np.random.choice(list(zones.keys()), n_trips, p=[0.25, 0.2, 0.2, 0.15, 0.1, 0.1])
-    trip_distances = np.random.exponential(8, n_trips) + 1
-    trip_durations = trip_distances * np.random.uniform(2, 4, n_trips)
-    base_time = datetime.datetime(2024, 1, 1, 6, 0, 0)
-    pickup_times = [base_time + timedelta(
-        days=np.random.randint(0, 7),
-        hours=np.random.randint(0, 24),
-        minutes=np.random.randint(0, 60)
-    ) for _ in range(n_trips)]
-    driver_types = np.random.choice(['Full-time', 'Part-time'], n_trips, p=[0.6, 0.4])
-    ab_groups = np.random.choice(['Control', 'Treatment'], n_trips, p=[0.5, 0.5])
-    fare_amounts = []
-    driver_payouts = []
-    for i in range(n_trips):
-        pickup_zone = pickup_zones[i]
-        distance = trip_distances[i]
-        duration = trip_durations[i]
-        base_fare = zones[pickup_zone]['base_fare']
-        distance_fare = distance * 1.5
-        time_fare = duration * 0.3
-        surge_multiplier = zones[pickup_zone]['surge_multiplier']
-        total_fare = (base_fare + distance_fare + time_fare) * surge_multiplier
-        total_fare *= np.random.uniform(0.95, 1.05)
-        payout_multiplier = np.random.uniform(0.7, 0.8)
-        if ab_groups[i] == 'Treatment':
-            payout_multiplier += 0.05
-        if driver_types[i] == 'Full-time':
-            payout_multiplier += 0.03
-        driver_payout = total_fare * payout_multiplier
-        fare_amounts.append(round(total_fare, 2))
-        driver_payouts.append(round(driver_payout, 2))
-    wait_times = []
-    for i in range(n_trips):
-        hour = pickup_times[i].hour
-        zone = pickup_zones[i]
-        demand_factor = zones[zone]['demand_factor']
-        base_wait = np.random.exponential(3)
-        time_factor = 1.5 if hour < 6 or hour > 22 else 1.0
-        zone_factor = 1.5 if demand_factor < 0.9 else 1.0
-        wait_time = base_wait * time_factor * zone_factor
-        wait_times.append(round(wait_time, 1))
-    cancellations = np.random.choice([True, False], n_trips, p=[0.05, 0.95])
-    df = pd.DataFrame({
-        'trip_id': trip_ids,
-        'driver_id': driver_ids,
-        'pickup_zone': pickup_zones,
-        'dropoff_zone': dropoff_zones,
-        'trip_distance_km': trip_distances,
-        'trip_duration_min': trip_durations,
-        'pickup_time': pickup_times,
-        'fare_amount': fare_amounts,
-        'driver_payout': driver_payouts,
-        'wait_time_min': wait_times,
-        'cancellation': cancellations,
-        'driver_type': driver_types,
-        'ab_group': ab_groups
-    })
-    return df
+    return trip_engine.generate_trip_data(n_trips, random_seed=42, pricing=SURGE_PRICING)
 
-def calculate_driver_expenses(df):
-    df['gas_cost'] = df['trip_distance_km'] * 0.12
-    df['time_cost'] = df['trip_duration_min'] * 0.25
-    df['wait_cost'] = df['wait_time_min'] * 0.20
-    df['total_expenses'] = df['gas_cost'] + df['time_cost'] + df['wait_cost']
-    df['net_earnings'] = df['driver_payout'] - df['total_expenses']
-    df['profitability_ratio'] = df['net_earnings'] / df['trip_duration_min']
-    n_unprofitable = max(1, int(0.02 * len(df)))
-    unprofitable_indices = np.random.choice(df.index, n_unprofitable, replace=False)
-    df.loc[unprofitable_indices, 'net_earnings'] = -np.abs(np.random.uniform(1, 10, n_unprofitable))
-    df.loc[unprofitable_indices, 'profitability_ratio'] = df.loc[unprofitable_indices, 'net_earnings'] / df.loc[unprofitable_indices, 'trip_duration_min']
-    return df
+# Columns the dashboard reads from a trip data file
+DASHBOARD_COLUMNS = ['pickup_zone', 'pickup_time', 'trip_distance_km', 'trip_duration_min',
+                     'driver_payout', 'wait_time_min', 'driver_type', 'ab_group']
+# Columns and number of rows in the filtered trips table
+TRIP_TABLE_COLUMNS = ['pickup_time', 'pickup_zone', 'driver_type', 'ab_group', 'trip_bucket',
+                      'trip_distance_km', 'trip_duration_min', 'driver_payout', 'total_expenses', 'net_earnings']
+TRIP_TABLE_ROWS = 100
+
+@st.cache_data
+def trip_file_zones(path, mtime):
+    # Pickup zones present in a Parquet/Feather trip file, from its partition index
+    return list(dict.fromkeys(trip_partitions(path)['pickup_zone']))
+
+@st.cache_resource
+def feature_cache():
+    # Derived trip features shared by every session, one entry per dataset
+    return FeatureCache(maxsize=16)
+
+def generated_features(n_trips=1000):
+    # Generated trips with expenses and trip buckets
+    return feature_cache().get(('generated', n_trips), lambda: generate_trip_data(n_trips))
+
+def trip_file_zone_features(path, mtime, zone):
+    # One zone of a trip data file with expenses and trip buckets: a memory-mapped
+    # read of only the dashboard's columns and that zone's partitions. mtime
+    # invalidates a rewritten file
+    return feature_cache().get(('file', path, mtime, zone),
+                               lambda: load_trip_data(path, columns=DASHBOARD_COLUMNS, zones=[zone]))
+
+@st.cache_resource(max_entries=16)
+def generated_trips(n_trips=1000):
+    # Generated trips and their bitmap filter index, shared across reruns without
+    # copying
+    df = generated_features(n_trips)
+    return df, BitmapIndex(df)
+
+@st.cache_data
+def generated_cube(n_trips=1000):
+    # Cube of the generated trips, built once per session
+    return build_cube(generated_features(n_trips))
+
+@st.cache_data
+def trip_file_zone_cube(path, mtime, zone):
+    # Cube of one zone of a trip data file. Cached per zone, so adding a zone to
+    # the filter reads just that zone
+    return build_cube(trip_file_zone_features(path, mtime, zone))
+
+@st.cache_resource(max_entries=16)
+def trip_file_zone_trips(path, mtime, zone):
+    # Trips of one zone of a trip data file with their bitmap filter index; only
+    # built when the filtered trips table is shown
+    df = trip_file_zone_features(path, mtime, zone)
+    return df, BitmapIndex(df)
+
+def trip_sources(path, mtime, zones):
+    # (trips, bitmap index) pairs behind the dashboard: one per selected zone of a
+    # trip data file, or the generated trips
+    if path:
+        return [trip_file_zone_trips(path, mtime, zone) for zone in zones]
+    return [generated_trips(1000)]
+
+@st.cache_data(max_entries=8, show_spinner="Sweeping cost scenarios...")
+def what_if_sweep(path, mtime, zones, selections, gas_rates, wait_rates, time_rate):
+    # What-if sweep over the filtered trips, read through the bitmap index masks
+    # without copying the trip frames; selections is a tuple of (column,
+    # values) pairs so the filters can be part of the cache key
+    sources = trip_sources(path, mtime, zones)
+    masks = [index.mask(index.select(**dict(selections))) for _, index in sources]
+    scenarios = cost_grid(gas_per_km=gas_rates, wait_per_min=wait_rates, time_per_min=time_rate)
+    return sweep([trips for trips, _ in sources], scenarios, rows=masks)
+
+def what_if_explorer(data_path, mtime, zones, selections):
+    # Heatmaps of profitability across a grid of gas and wait cost rates, and of
+    # net earnings by zone and hour for one scenario of the grid
+    c1, c2, c3 = st.columns(3)
+    gas_low, gas_high = c1.slider("Gas cost ($/km)", 0.0, 0.5, (0.05, 0.30), 0.01)
+    wait_low, wait_high = c2.slider("Wait cost ($/min)", 0.0, 1.0, (0.0, 0.50), 0.05)
+    time_rate = c3.number_input("Time cost ($/min)", 0.0, 2.0, 0.25, 0.05)
+    gas_rates = tuple(np.round(np.linspace(gas_low, gas_high, 50), 4))
+    wait_rates = tuple(np.round(np.linspace(wait_low, wait_high, 20), 4))
+    result = what_if_sweep(data_path, mtime, tuple(zones), selections, gas_rates, wait_rates, time_rate)
+    if result.empty:
+        st.info("No trips match the filters.")
+        return
+    totals = sweep_rollup(result)
+    share = totals.pivot(index='wait_per_min', columns='gas_per_km', values='profitable_share')
+    fig = px.imshow(share * 100, origin='lower', aspect='auto', color_continuous_scale='RdYlGn',
+                    labels={'x': 'Gas cost ($/km)', 'y': 'Wait cost ($/min)', 'color': '% profitable'})
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Share of profitable trips under {len(totals):,} cost scenarios at ${time_rate:.2f}/min time cost.")
+
+    c1, c2 = st.columns(2)
+    gas = c1.select_slider("Scenario gas cost ($/km)", gas_rates, value=gas_rates[len(gas_rates) // 2])
+    wait = c2.select_slider("Scenario wait cost ($/min)", wait_rates, value=wait_rates[len(wait_rates) // 2])
+    scenario = totals.index[(totals['gas_per_km'] == gas) & (totals['wait_per_min'] == wait)][0]
+    cells = result.loc[scenario, 'net_earnings'].unstack('hour')
+    fig = px.imshow(cells, aspect='auto', color_continuous_scale='Blues',
+                    labels={'x': 'Pickup hour', 'y': 'Zone', 'color': 'Net earnings'})
+    st.plotly_chart(fig, use_container_width=True)
+    overall = totals.loc[scenario]
+    st.caption(f"At ${gas:.2f}/km gas and ${wait:.2f}/min wait: average net earnings ${overall['net_earnings']:.2f}, "
+               f"{overall['profitable_share']:.0%} of trips profitable.")
+
+def filtered_trip_sample(sources, limit, **selections):
+    # Count of the trips matching the filters and the first `limit` of them,
+    # resolved through each source's bitmap index without filtering its frame
+    n_selected, sample = 0, []
+    for trips, index in sources:
+        bitmap = index.select(**selections)
+        n_selected += index.count(bitmap)
+        needed = limit - sum(len(part) for part in sample)
+        if needed > 0:
+            sample.append(trips.iloc[index.rows(bitmap, needed)])
+    sample = pd.concat(sample, ignore_index=True) if sample else pd.DataFrame()
+    return n_selected, sample
+
+def trip_file_error(path):
+    # Reason the file (or directory or glob pattern of shard files) cannot back
+    # the dashboard, or None
+    files = trip_files(path)
+    if not files:
+        return f"Trip data file not found: {path}"
+    for file in files:
+        if trip_format(file) == 'csv':
+            return "Trip data file must be Parquet or Feather (see data_generator.py --format)."
+        schema = trip_schema(file)
+        missing = [c for c in DASHBOARD_COLUMNS if c not in schema.names]
+        if missing:
+            return f"Trip data file {file} is missing columns: {', '.join(missing)}."
+        # Zones are listed and read through the partition index write_trip_file stores
+        if PARTITIONS_KEY not in (schema.metadata or {}):
+            return f"Trip data file {file} has no partition index (write it with data_generator.py)."
+    return None
 
 # --- Helper for plain-language insights ---
-def generate_plain_insights(df):
+def generate_plain_insights(cells):
     insights = []
     # Earnings by region
-    region_earnings = df.groupby('pickup_zone')['net_earnings'].mean().sort_values(ascending=False)
+    region_earnings = cell_mean(cells, by='pickup_zone').sort_values(ascending=False)
     best_zone = region_earnings.index[0]
     worst_zone = region_earnings.index[-1]
     pct_diff = (region_earnings[best_zone] - region_earnings[worst_zone]) / region_earnings[worst_zone] * 100
     insights.append(f"{best_zone} drivers earn {pct_diff:.0f}% more per trip than {worst_zone}.")
     # Earnings by hour
-    hourly = df.groupby(df['pickup_time'].dt.hour)['net_earnings'].mean()
+    hourly = cell_mean(cells, by='hour')
     best_hour = hourly.idxmax()
     worst_hour = hourly.idxmin()
     insights.append(f"Best hour: {best_hour}:00, Worst hour: {worst_hour}:00.")
     # Earnings by trip length
-    df['trip_bucket'] = pd.cut(df['trip_distance_km'], [0,5,10,100], labels=['Short','Medium','Long'])
-    trip_earn = df.groupby('trip_bucket')['net_earnings'].mean()
+    trip_earn = cell_mean(cells, by='trip_bucket')
     best_bucket = trip_earn.idxmax()
     insights.append(f"{best_bucket} trips are most profitable.")
     return insights
 
 # --- Helper for A/B badge ---
-def ab_test_badge(df):
-    control = df[df['ab_group']=='Control']['net_earnings']
-    treat = df[df['ab_group']=='Treatment']['net_earnings']
-    lift = (treat.mean() - control.mean()) / control.mean() * 100
-    # Use a simple t-test for p-value
-    from scipy.stats import ttest_ind
-    tstat, pval = ttest_ind(treat, control)
+def ab_test_badge(cells):
+    # Pooled-variance t-test from the cube's per-group (n, mean, M2) accumulators
+    result = ab_test(cells)
+    lift, pval = result['lift'], result['pval']
     badge = f"{'✅' if pval<0.05 else '⚠️'} Treatment group outperformed control by {lift:+.1f}% in net earnings. p = {pval:.3f}"
-    sub = "Suggest further testing across more regions."
+    sub = (f"Difference per trip: ${result['diff']:+.2f} (95% CI ${result['ci_low']:+.2f} to ${result['ci_high']:+.2f}), "
+           f"power {result['power']:.0%}. Suggest further testing across more regions.")
     return badge, sub
 
 # --- Helper for business recs ---
-def business_recs(df):
+def business_recs(cells):
     recs = []
     # Find lowest zone/hour
-    hourly = df.groupby([df['pickup_time'].dt.hour, 'pickup_zone'])['net_earnings'].mean()
+    hourly = cell_mean(cells, by=['hour', 'pickup_zone'])
     if not hourly.empty:
         idx = hourly.idxmin()
         recs.append(f"📉 Drivers earned least in {idx[1]} {idx[0]}–{idx[0]+1}h – consider higher wait-time bonus.")
     # Find low trip bucket
-    df['trip_bucket'] = pd.cut(df['trip_distance_km'], [0,5,10,100], labels=['Short','Medium','Long'])
-    trip_earn = df.groupby('trip_bucket')['net_earnings'].mean()
+    trip_earn = cell_mean(cells, by='trip_bucket')
     if not trip_earn.empty:
         low_bucket = trip_earn.idxmin()
         recs.append(f"🛣️ {low_bucket} trips are least profitable – review pricing or incentives.")
     return recs
 
 # --- Cost breakdown card ---
-def cost_breakdown_card(df):
-    avg_gas = df['gas_cost'].mean()
-    avg_time = df['time_cost'].mean()
-    avg_wait = df['wait_cost'].mean()
+def cost_breakdown_card(cells):
+    avg_gas = cell_mean(cells, 'gas_cost')
+    avg_time = cell_mean(cells, 'time_cost')
+    avg_wait = cell_mean(cells, 'wait_cost')
     st.markdown("""
     <div style='background:#fffbe7;padding:1rem;border-radius:0.5rem;border-left:5px solid #ffb300;margin-bottom:1rem;'>
     <b>Where does the money go?</b><br>
@@ -160,7 +214,7 @@ def cost_breakdown_card(df):
     """.format(avg_gas, avg_time, avg_wait), unsafe_allow_html=True)
 
 # --- Comparison tool ---
-def comparison_tool(df, compare_type, compare_options):
+def comparison_tool(cells, compare_type, compare_options):
     st.markdown("<b>Compare any two:</b>", unsafe_allow_html=True)
     c1, c2 = st.columns(2)
     with c1:
@@ -170,15 +224,12 @@ def comparison_tool(df, compare_type, compare_options):
     if left == right:
         st.info("Select two different options.")
         return
-    if compare_type == 'zone':
-        left_df = df[df['pickup_zone']==left]
-        right_df = df[df['pickup_zone']==right]
-    else:
-        left_df = df[df['driver_type']==left]
-        right_df = df[df['driver_type']==right]
+    dim = 'pickup_zone' if compare_type == 'zone' else 'driver_type'
+    left_cells = select_cells(cells, **{dim: [left]})
+    right_cells = select_cells(cells, **{dim: [right]})
     # Net Earnings
-    left_net = left_df['net_earnings'].mean()
-    right_net = right_df['net_earnings'].mean()
+    left_net = cell_mean(left_cells, 'net_earnings')
+    right_net = cell_mean(right_cells, 'net_earnings')
     net_diff = left_net - right_net
     net_pct = 100 * net_diff / right_net if right_net != 0 else 0
     st.markdown(f"Net Earnings: {left}: <b>{left_net:.2f}</b>, {right}: <b>{right_net:.2f}</b>", unsafe_allow_html=True)
@@ -190,8 +241,8 @@ def comparison_tool(df, compare_type, compare_options):
     else:
         st.caption("No meaningful difference in net earnings per trip.")
     # Driver Payout
-    left_payout = left_df['driver_payout'].mean()
-    right_payout = right_df['driver_payout'].mean()
+    left_payout = cell_mean(left_cells, 'driver_payout')
+    right_payout = cell_mean(right_cells, 'driver_payout')
     payout_diff = left_payout - right_payout
     payout_pct = 100 * payout_diff / right_payout if right_payout != 0 else 0
     st.markdown(f"Driver Payout: {left}: <b>{left_payout:.2f}</b>, {right}: <b>{right_payout:.2f}</b>", unsafe_allow_html=True)
@@ -203,8 +254,8 @@ def comparison_tool(df, compare_type, compare_options):
     else:
         st.caption("No meaningful difference in driver payout per trip.")
     # Trip Distance
-    left_dist = left_df['trip_distance_km'].mean()
-    right_dist = right_df['trip_distance_km'].mean()
+    left_dist = cell_mean(left_cells, 'trip_distance_km')
+    right_dist = cell_mean(right_cells, 'trip_distance_km')
     dist_diff = left_dist - right_dist
     dist_pct = 100 * dist_diff / right_dist if right_dist != 0 else 0
     st.markdown(f"Trip Distance Km: {left}: <b>{left_dist:.2f}</b>, {right}: <b>{right_dist:.2f}</b>", unsafe_allow_html=True)
@@ -229,14 +280,24 @@ def main():
         "We use 'Treatment' and 'Control' groups to test different incentive or pricing strategies. This helps us see what works best for drivers.\n"
         "- For example, the Treatment group might receive a higher per-trip bonus than the Control group."
     )
-    df = generate_trip_data(1000)
-    df = calculate_driver_expenses(df)
     st.sidebar.header("Filters")
-    zones = list(df['pickup_zone'].unique())
-    types = list(df['driver_type'].unique())
-    df['trip_bucket'] = pd.cut(df['trip_distance_km'], [0,5,10,100], labels=['Short','Medium','Long'])
-    buckets = list(df['trip_bucket'].unique())
-    ab_opts = list(df['ab_group'].unique())
+    data_path = st.sidebar.text_input("Trip data file or shard pattern (Parquet/Feather)", value=os.environ.get('TRIP_DATA_PATH', ''))
+    if data_path:
+        error = trip_file_error(data_path)
+        if error:
+            st.sidebar.warning(f"{error} Using generated data.")
+            data_path = ''
+    if data_path:
+        # Cache key for the file contents; the newest file if there are several shards
+        mtime = max(os.path.getmtime(f) for f in trip_files(data_path))
+        zones = trip_file_zones(data_path, mtime)
+    else:
+        mtime = None
+        cube = generated_cube(1000)
+        zones = list(cell_mean(cube, by='pickup_zone').index)
+    types = DRIVER_TYPES.copy()
+    buckets = TRIP_BUCKETS.copy()
+    ab_opts = AB_GROUPS.copy()
 
     # --- RESET LOGIC ---
     if 'reset_filters' not in st.session_state:
@@ -270,22 +331,31 @@ def main():
     bucket_sel = st.sidebar.multiselect("Trip Length", buckets, default=st.session_state['bucket_sel'], key='bucket_sel')
     ab_sel = st.sidebar.multiselect("A/B Group", ab_opts, default=st.session_state['ab_sel'], key='ab_sel')
 
-    # Apply filters
-    filtered = df[
-        df['pickup_zone'].isin(st.session_state['zone_sel']) &
-        df['driver_type'].isin(st.session_state['type_sel']) &
-        df['trip_bucket'].isin(st.session_state['bucket_sel']) &
-        df['ab_group'].isin(st.session_state['ab_sel'])
-    ]
+    # Cube of the selected zones from a trip data file
+    if data_path:
+        # The zone filter below still applies, so an empty selection can use any zone
+        cube = None
+        for zone in zone_sel or zones[:1]:
+            zone_cube = trip_file_zone_cube(data_path, mtime, zone)
+            cube = zone_cube if cube is None else cube + zone_cube
+
+    # Apply filters to the cube's cells
+    filtered = select_cells(
+        cube,
+        pickup_zone=st.session_state['zone_sel'],
+        driver_type=st.session_state['type_sel'],
+        trip_bucket=st.session_state['bucket_sel'],
+        ab_group=st.session_state['ab_sel'],
+    )
     # --- Top metrics ---
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("💰 Avg Net Earnings", f"${filtered['net_earnings'].mean():.2f}")
+        st.metric("💰 Avg Net Earnings", f"${cell_mean(filtered):.2f}")
     with col2:
-        best_zone = filtered.groupby('pickup_zone')['net_earnings'].mean().idxmax()
+        best_zone = cell_mean(filtered, by='pickup_zone').idxmax()
         st.metric("📍 Best Zone", best_zone)
     with col3:
-        best_bucket = filtered.groupby('trip_bucket')['net_earnings'].mean().idxmax()
+        best_bucket = cell_mean(filtered, by='trip_bucket').idxmax()
         st.metric("🛣️ Best Trip Length", str(best_bucket))
     # --- Plain-language insights ---
     st.markdown("### Key Insights")
@@ -299,12 +369,12 @@ def main():
     st.markdown("---")
     st.subheader("Earnings by Region")
     st.caption("Which pickup zones are most profitable for drivers? Use this to prioritize incentive programs and resource allocation.")
-    reg = filtered.groupby('pickup_zone')['net_earnings'].mean().sort_values()
+    reg = cell_mean(filtered, by='pickup_zone').sort_values()
     fig1 = px.bar(reg, x=reg.values, y=reg.index, orientation='h', color=reg.values, color_continuous_scale='Blues', labels={'x':'Net Earnings','y':'Zone'})
     st.plotly_chart(fig1, use_container_width=True)
     st.subheader("Earnings by Trip Length")
     st.caption("Compare short, medium, and long trips. Use this to inform trip pricing and bonus strategies.")
-    tb = filtered.groupby('trip_bucket')['net_earnings'].mean()
+    tb = cell_mean(filtered, by='trip_bucket')
     fig3 = px.bar(tb, x=tb.index, y=tb.values, color=tb.values, color_continuous_scale='Greens', labels={'x':'Trip Length','y':'Net Earnings'})
     st.plotly_chart(fig3, use_container_width=True)
     # --- Cost breakdown card ---
@@ -319,8 +389,33 @@ def main():
     st.markdown("### Compare Zones or Driver Types")
     st.caption("Quickly compare two zones or driver types to see where Uber can make the biggest impact for drivers.")
     comp_type = st.radio("Compare by", ['zone','driver_type'], horizontal=True)
-    options = list(filtered['pickup_zone'].unique()) if comp_type=='zone' else list(filtered['driver_type'].unique())
+    options = list(cell_mean(filtered, by='pickup_zone' if comp_type=='zone' else 'driver_type').index)
     comparison_tool(filtered, comp_type, options)
+    # --- Filtered trips ---
+    st.markdown("---")
+    st.markdown("### Filtered Trips")
+    if st.checkbox("Show filtered trips", key='show_trips'):
+        n_selected, sample = filtered_trip_sample(
+            trip_sources(data_path, mtime, zone_sel),
+            TRIP_TABLE_ROWS,
+            pickup_zone=st.session_state['zone_sel'],
+            driver_type=st.session_state['type_sel'],
+            trip_bucket=st.session_state['bucket_sel'],
+            ab_group=st.session_state['ab_sel'],
+        )
+        st.caption(f"{n_selected:,} trips match the filters; showing the first {len(sample):,}.")
+        if len(sample):
+            st.dataframe(sample[TRIP_TABLE_COLUMNS], use_container_width=True, hide_index=True)
+    # --- What-if cost explorer ---
+    st.markdown("---")
+    st.markdown("### What-If: Driver Cost Rates")
+    st.caption("See how gas and waiting costs change driver profitability across zones and hours of the day.")
+    if st.checkbox("Explore cost scenarios", key='show_what_if'):
+        selections = (('pickup_zone', tuple(st.session_state['zone_sel'])),
+                      ('driver_type', tuple(st.session_state['type_sel'])),
+                      ('trip_bucket', tuple(st.session_state['bucket_sel'])),
+                      ('ab_group', tuple(st.session_state['ab_sel'])))
+        what_if_explorer(data_path, mtime, zone_sel, selections)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
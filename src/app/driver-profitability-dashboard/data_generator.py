@@ -1,156 +1,62 @@
 """
 Data Generator for Driver Profitability Dashboard
 
-This script generates realistic trip data for Uber drivers and can export it to CSV
-for further analysis or use in other tools.
+This script generates realistic trip data for Uber drivers with the shared trip
+engine (trip_engine.py) and can export it to CSV, Parquet or Feather for further
+analysis or use in other tools.
 """
 
 import pandas as pd
-import numpy as np
-import datetime
-from datetime import timedelta
 import argparse
+import trip_engine
+from trip_engine import (PRICING_MODELS, STANDARD_PRICING, FORMATS, calculate_driver_expenses,
+                         write_trip_file, write_trip_shards)
 
-def generate_trip_data(n_trips=1000, output_file=None):
+def generate_trip_data(n_trips=1000, output_file=None, random_seed=42, workers=1, format=None,
+                       pricing=STANDARD_PRICING):
     """
     Generate realistic trip data for analysis
     
+    Trips are generated in fixed-size shards (see trip_engine.trip_shards),
+    optionally in parallel; the result is the same for any number of workers.
+    
     Args:
         n_trips (int): Number of trips to generate
-        output_file (str): Optional CSV file path to save data
+        output_file (str): Optional file path to save data
+        random_seed (int): Seed for the random number generator
+        workers (int): Number of processes generating shards
+        format (str): Optional output format ('csv', 'parquet' or 'feather');
+            inferred from the output file extension if omitted
+        pricing (PricingModel): Pricing model for fares and payouts
     
     Returns:
         pd.DataFrame: Generated trip data
     """
     
-    # Define zones and their characteristics
-    zones = {
-        'Downtown': {'base_fare': 15, 'demand_factor': 1.2},
-        'Etobicoke': {'base_fare': 12, 'demand_factor': 0.8},
-        'North York': {'base_fare': 14, 'demand_factor': 1.0},
-        'Scarborough': {'base_fare': 13, 'demand_factor': 0.9},
-        'Mississauga': {'base_fare': 11, 'demand_factor': 0.7},
-        'Brampton': {'base_fare': 10, 'demand_factor': 0.6}
-    }
-    
-    # Generate trip data
-    np.random.seed(42)
-    
-    trip_ids = [f"TRIP_{i:06d}" for i in range(1, n_trips + 1)]
-    driver_ids = [f"DRIVER_{np.random.randint(1000, 9999)}" for _ in range(n_trips)]
-    
-    # Generate pickup and dropoff zones
-    pickup_zones = np.random.choice(list(zones.keys()), n_trips, p=[0.3, 0.15, 0.2, 0.15, 0.1, 0.1])
-    dropoff_zones = np.random.choice(list(zones.keys()), n_trips, p=[0.25, 0.2, 0.2, 0.15, 0.1, 0.1])
-    
-    # Generate trip characteristics
-    trip_distances = np.random.exponential(8, n_trips) + 1  # 1-30 km range
-    trip_durations = trip_distances * np.random.uniform(2, 4, n_trips)  # 2-4 min per km
-    
-    # Generate timestamps across a week
-    base_time = datetime.datetime(2024, 1, 1, 6, 0, 0)
-    pickup_times = [base_time + timedelta(
-        days=np.random.randint(0, 7),
-        hours=np.random.randint(0, 24),
-        minutes=np.random.randint(0, 60)
-    ) for _ in range(n_trips)]
-    
-    # Calculate fares based on zones and distance
-    fare_amounts = []
-    driver_payouts = []
-    
-    for i in range(n_trips):
-        pickup_zone = pickup_zones[i]
-        distance = trip_distances[i]
-        duration = trip_durations[i]
-        
-        # Base fare calculation
-        base_fare = zones[pickup_zone]['base_fare']
-        distance_fare = distance * 1.5  # $1.50 per km
-        time_fare = duration * 0.3  # $0.30 per minute
-        
-        total_fare = base_fare + distance_fare + time_fare
-        total_fare *= np.random.uniform(0.9, 1.1)  # Add some variability
-        
-        # Driver payout (typically 70-80% of fare)
-        driver_payout = total_fare * np.random.uniform(0.7, 0.8)
-        
-        fare_amounts.append(round(total_fare, 2))
-        driver_payouts.append(round(driver_payout, 2))
-    
-    # Generate wait times (higher during low demand periods)
-    wait_times = []
-    for i in range(n_trips):
-        hour = pickup_times[i].hour
-        zone = pickup_zones[i]
-        demand_factor = zones[zone]['demand_factor']
-        
-        # Higher wait times during off-peak hours and low-demand zones
-        base_wait = np.random.exponential(3)
-        time_factor = 1.5 if hour < 6 or hour > 22 else 1.0
-        zone_factor = 1.5 if demand_factor < 0.9 else 1.0
-        
-        wait_time = base_wait * time_factor * zone_factor
-        wait_times.append(round(wait_time, 1))
-    
-    # Generate cancellations (rare)
-    cancellations = np.random.choice([True, False], n_trips, p=[0.05, 0.95])
-    
-    # Create DataFrame
-    df = pd.DataFrame({
-        'trip_id': trip_ids,
-        'driver_id': driver_ids,
-        'pickup_zone': pickup_zones,
-        'dropoff_zone': dropoff_zones,
-        'trip_distance_km': trip_distances,
-        'trip_duration_min': trip_durations,
-        'pickup_time': pickup_times,
-        'fare_amount': fare_amounts,
-        'driver_payout': driver_payouts,
-        'wait_time_min': wait_times,
-        'cancellation': cancellations
-    })
-    
-    # Calculate additional metrics
-    df = calculate_driver_expenses(df)
-    
-    # Save to CSV if output file specified
+    df = trip_engine.generate_trip_data(n_trips, random_seed, workers, pricing)
+    
+    # Save to file if output file specified
     if output_file:
-        df.to_csv(output_file, index=False)
+        write_trip_file(df, output_file, format)
         print(f"Data saved to {output_file}")
     
     return df
 
-def calculate_driver_expenses(df):
+def memory_report(df):
     """
-    Calculate driver expenses and net earnings
+    Report memory usage per column
     
     Args:
         df (pd.DataFrame): Trip data
     
     Returns:
-        pd.DataFrame: Data with expense calculations
+        pd.DataFrame: dtype, bytes and MB per column, with a total row
     """
-    
-    # Gas cost: $0.12 per km
-    df['gas_cost'] = df['trip_distance_km'] * 0.12
-    
-    # Time cost: $0.25 per minute
-    df['time_cost'] = df['trip_duration_min'] * 0.25
-    
-    # Wait cost: $0.20 per minute
-    df['wait_cost'] = df['wait_time_min'] * 0.20
-    
-    # Total expenses
-    df['total_expenses'] = df['gas_cost'] + df['time_cost'] + df['wait_cost']
-    
-    # Net earnings
-    df['net_earnings'] = df['driver_payout'] - df['total_expenses']
-    
-    # Profitability ratio
-    df['profitability_ratio'] = df['net_earnings'] / df['trip_duration_min']
-    
-    return df
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str), 'bytes': usage})
+    report.loc['total'] = ['', usage.sum()]
+    report['MB'] = report['bytes'] / 1024 ** 2
+    return report
 
 def print_summary_stats(df):
     """
@@ -170,7 +76,7 @@ def print_summary_stats(df):
     print(f"⏱️  Average Trip Duration: {df['trip_duration_min'].mean():.1f} minutes")
     
     print(f"\n🏢 Earnings by Zone:")
-    zone_earnings = df.groupby('pickup_zone')['net_earnings'].mean().sort_values(ascending=False)
+    zone_earnings = df.groupby('pickup_zone', observed=True)['net_earnings'].mean().sort_values(ascending=False)
     for zone, earnings in zone_earnings.items():
         print(f"   {zone}: ${earnings:.2f}")
     
@@ -190,20 +96,44 @@ def main():
     
     parser = argparse.ArgumentParser(description='Generate trip data for driver profitability analysis')
     parser.add_argument('--trips', type=int, default=1000, help='Number of trips to generate (default: 1000)')
-    parser.add_argument('--output', type=str, help='Output CSV file path (optional)')
+    parser.add_argument('--output', type=str, help='Output file path (optional)')
+    parser.add_argument('--format', choices=list(FORMATS), help='Output format (default: from the --output extension, else csv)')
     parser.add_argument('--summary', action='store_true', help='Print summary statistics')
+    parser.add_argument('--memory', action='store_true', help='Print memory usage per column')
+    parser.add_argument('--workers', type=int, default=1, help='Processes generating shards (default: 1)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--pricing', choices=list(PRICING_MODELS), default='standard', help='Pricing model (default: standard)')
     
     args = parser.parse_args()
     
     print(f"Generating {args.trips:,} trip records...")
     
-    # Generate data
-    df = generate_trip_data(args.trips, args.output)
+    # Output files are written shard by shard by the workers, so their layout
+    # depends only on --trips and nothing is gathered in this process; the
+    # reports read the written files back instead of generating the trips again
+    if args.output:
+        paths = write_trip_shards(args.trips, args.output, args.seed, args.workers, args.format,
+                                  PRICING_MODELS[args.pricing])
+        if len(paths) == 1:
+            print(f"Data saved to {paths[0]}")
+        else:
+            print(f"Data saved to {len(paths)} shard files: {paths[0]} ... {paths[-1]}")
+        if not (args.summary or args.memory):
+            print(f"\n✅ Generated {args.trips:,} trip records successfully!")
+            return
+        df = trip_engine.load_trip_data(paths)
+    else:
+        df = generate_trip_data(args.trips, None, args.seed, args.workers, args.format,
+                                PRICING_MODELS[args.pricing])
     
     # Print summary if requested
     if args.summary:
         print_summary_stats(df)
     
+    # Print memory report if requested
+    if args.memory:
+        print(memory_report(df).to_string(float_format=lambda x: f"{x:.2f}"))
+    
     print(f"\n✅ Generated {len(df):,} trip records successfully!")
     
     if not args.output:
@@ -24,7 +24,7 @@ def create_demo_visualizations(df):
     fig.suptitle('Driver Profitability Dashboard - Demo Analysis', fontsize=16, fontweight='bold')
     
     # 1. Earnings by Region
-    region_earnings = df.groupby('pickup_zone')['net_earnings'].mean().sort_values(ascending=True)
+    region_earnings = df.groupby('pickup_zone', observed=True)['net_earnings'].mean().sort_values(ascending=True)
     bars = ax1.barh(region_earnings.index, region_earnings.values, color='skyblue')
     ax1.set_title('Average Net Earnings by Region')
     ax1.set_xlabel('Average Net Earnings ($)')
@@ -94,7 +94,7 @@ def print_demo_insights(df):
     
     # Zone analysis
     print(f"\n🏢 ZONE ANALYSIS:")
-    zone_earnings = df.groupby('pickup_zone')['net_earnings'].mean().sort_values(ascending=False)
+    zone_earnings = df.groupby('pickup_zone', observed=True)['net_earnings'].mean().sort_values(ascending=False)
     best_zone = zone_earnings.index[0]
     worst_zone = zone_earnings.index[-1]
     print(f"   Most Profitable Zone: {best_zone} (${zone_earnings.iloc[0]:.2f})")
@@ -0,0 +1,108 @@
+"""
+Bitmap Filter Index for Driver Profitability Dashboard
+
+Keeps one packed bitmap (one bit per trip) per value of each filter column, so
+a combination of multiselect filters resolves to OR within a column and AND
+across columns over n/8 bytes per value, and the selected trips can be
+counted, listed or passed on as a row mask (e.g. to what_if.sweep) without
+copying the trip frame.
+"""
+
+import numpy as np
+
+FILTER_COLUMNS = ['pickup_zone', 'driver_type', 'trip_bucket', 'ab_group']
+
+# Set bits in every byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+class BitmapIndex:
+    """
+    Per-value bitmaps over the trips of one dataset
+
+    Args:
+        df (pd.DataFrame): Trip data
+        columns (list): Filter columns to index
+    """
+
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.n = len(df)
+        self.bitmaps = {}
+        for column in columns:
+            values = df[column].astype('category')
+            codes = values.cat.codes.to_numpy()
+            self.bitmaps[column] = {value: np.packbits(codes == i)
+                                    for i, value in enumerate(values.cat.categories)}
+
+    def all(self):
+        """
+        Bitmap selecting every trip
+
+        Returns:
+            np.ndarray: Packed bitmap
+        """
+        return np.packbits(np.ones(self.n, dtype=bool))
+
+    def select(self, **selections):
+        """
+        Resolve a filter combination to a bitmap
+
+        Args:
+            **selections: Column name to the list of values to keep; values
+                without any trips select nothing
+
+        Returns:
+            np.ndarray: Packed bitmap of the matching trips
+        """
+        result = self.all()
+        for column, values in selections.items():
+            column_bitmap = np.zeros_like(result)
+            for value in values:
+                if value in self.bitmaps[column]:
+                    column_bitmap |= self.bitmaps[column][value]
+            result &= column_bitmap
+        return result
+
+    def count(self, bitmap):
+        """
+        Number of selected trips
+
+        Args:
+            bitmap (np.ndarray): Packed bitmap from select
+
+        Returns:
+            int: Selected trip count
+        """
+        return int(_POPCOUNT[bitmap].sum(dtype=np.int64))
+
+    def mask(self, bitmap):
+        """
+        Boolean row mask of the selected trips
+
+        Args:
+            bitmap (np.ndarray): Packed bitmap from select
+
+        Returns:
+            np.ndarray: One bool per trip
+        """
+        return np.unpackbits(bitmap, count=self.n).view(bool)
+
+    def rows(self, bitmap, limit=None):
+        """
+        Positions of the selected trips, in trip order
+
+        Only the bytes holding the first `limit` selected trips are unpacked.
+
+        Args:
+            bitmap (np.ndarray): Packed bitmap from select
+            limit (int): Optional maximum number of positions
+
+        Returns:
+            np.ndarray: Row positions for df.iloc / np.take
+        """
+        nonzero = np.flatnonzero(bitmap)
+        if limit is not None:
+            nonzero = nonzero[:limit]
+        bits = np.unpackbits(bitmap[nonzero]).reshape(-1, 8)
+        byte, bit = np.nonzero(bits)
+        positions = nonzero[byte] * 8 + bit
+        return positions if limit is None else positions[:limit]
@@ -0,0 +1,162 @@
+"""
+Trip Cube for Driver Profitability Dashboard
+
+Pre-aggregates trip data into a dense cube of sufficient statistics (count, sum
+and sum of squares of each measure) over every pickup_zone x driver_type x
+trip_bucket x ab_group x hour cell. Filters, means, group-bys and t-tests are
+then answered by summing cells, so their cost depends on the number of cells
+rather than the number of trips.
+"""
+
+import pandas as pd
+import numpy as np
+from ab_stats import GroupStats, t_test, power
+
+CUBE_DIMS = ['pickup_zone', 'driver_type', 'trip_bucket', 'ab_group', 'hour']
+CUBE_MEASURES = ['net_earnings', 'driver_payout', 'trip_distance_km', 'gas_cost', 'time_cost', 'wait_cost']
+TRIP_BUCKETS = ['Short', 'Medium', 'Long']
+
+def trip_buckets(distances):
+    """
+    Bucket trip distances into Short (0-5 km), Medium (5-10 km) and Long (10-100 km)
+
+    Args:
+        distances (pd.Series): Trip distances in km
+
+    Returns:
+        pd.Series: Categorical trip buckets; NaN outside 0-100 km
+    """
+    return pd.cut(distances, [0, 5, 10, 100], labels=TRIP_BUCKETS)
+
+def dim_codes(df, dim):
+    """
+    Integer codes and levels of one cube dimension
+
+    Args:
+        df (pd.DataFrame): Trip data
+        dim (str): One of CUBE_DIMS
+
+    Returns:
+        tuple: Codes per trip (-1 where missing) and the dimension's levels
+    """
+    if dim == 'hour':
+        return df['pickup_time'].dt.hour.to_numpy(), list(range(24))
+    if dim == 'trip_bucket' and dim not in df:
+        values = trip_buckets(df['trip_distance_km'])
+    else:
+        values = df[dim].astype('category')
+    categories = values.cat.categories
+    return values.cat.codes.to_numpy(), pd.CategoricalIndex(categories, categories=categories, name=dim)
+
+def build_cube(df, measures=CUBE_MEASURES):
+    """
+    Aggregate trips into the cube in one pass over the data
+
+    Trips outside every trip bucket (over 100 km) are left out, as the
+    dashboard's trip-length filter always excludes them.
+
+    Args:
+        df (pd.DataFrame): Trip data with expense calculations
+        measures (list): Columns to keep sums and sums of squares of
+
+    Returns:
+        pd.DataFrame: One row per cell (including empty ones), indexed by
+            CUBE_DIMS, with n and <measure>_sum / <measure>_sumsq columns
+    """
+    codes, levels = zip(*[dim_codes(df, dim) for dim in CUBE_DIMS])
+    shape = [len(level) for level in levels]
+    valid = np.logical_and.reduce([c >= 0 for c in codes])
+    cells = np.ravel_multi_index([c[valid] for c in codes], shape)
+    n_cells = int(np.prod(shape))
+
+    stats = {'n': np.bincount(cells, minlength=n_cells)}
+    for measure in measures:
+        values = df[measure].to_numpy(dtype=float)[valid]
+        stats[f'{measure}_sum'] = np.bincount(cells, weights=values, minlength=n_cells)
+        stats[f'{measure}_sumsq'] = np.bincount(cells, weights=values ** 2, minlength=n_cells)
+    index = pd.MultiIndex.from_product(levels, names=CUBE_DIMS)
+    return pd.DataFrame(stats, index=index)
+
+def select_cells(cube, **selections):
+    """
+    Keep the cells matching a filter on each dimension
+
+    Args:
+        cube (pd.DataFrame): Cube from build_cube
+        **selections: Dimension name to the list of values to keep
+
+    Returns:
+        pd.DataFrame: Matching cells
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    for dim, values in selections.items():
+        mask &= cube.index.get_level_values(dim).isin(values)
+    return cube[mask]
+
+def rollup(cells, by):
+    """
+    Sum cells up to the given dimensions, dropping empty groups
+
+    Args:
+        cells (pd.DataFrame): Cells from build_cube or select_cells
+        by (str or list): Dimension(s) to keep
+
+    Returns:
+        pd.DataFrame: Summed statistics per group
+    """
+    stats = cells.groupby(level=by, observed=True).sum()
+    return stats[stats['n'] > 0]
+
+def cell_mean(cells, measure='net_earnings', by=None):
+    """
+    Mean of a measure over the cells, overall or per group
+
+    Args:
+        cells (pd.DataFrame): Cells from build_cube or select_cells
+        measure (str): Measure to average
+        by (str or list): Optional dimension(s) to group by
+
+    Returns:
+        float or pd.Series: Mean overall, or per non-empty group
+    """
+    if by is None:
+        return cells[f'{measure}_sum'].sum() / cells['n'].sum()
+    stats = rollup(cells, by)
+    return stats[f'{measure}_sum'] / stats['n']
+
+def cell_stats(cells, measure='net_earnings', by='ab_group'):
+    """
+    Per-group (n, mean, M2) accumulators of a measure from cell statistics
+
+    Args:
+        cells (pd.DataFrame): Cells from build_cube or select_cells
+        measure (str): Measure to summarize
+        by (str): Dimension to group by
+
+    Returns:
+        dict: Group value to GroupStats, for non-empty groups
+    """
+    stats = rollup(cells, by)
+    return {group: GroupStats.from_sums(row['n'], row[f'{measure}_sum'], row[f'{measure}_sumsq'])
+            for group, row in stats.iterrows()}
+
+def ab_test(cells, measure='net_earnings', equal_var=True, alpha=0.05):
+    """
+    Treatment vs Control two-sample t-test from cell statistics
+
+    Args:
+        cells (pd.DataFrame): Cells from build_cube or select_cells
+        measure (str): Measure to compare
+        equal_var (bool): Pooled-variance test if True, Welch otherwise
+        alpha (float): Significance level for the CI and power
+
+    Returns:
+        dict: ab_stats.t_test results plus the power to detect the observed
+            difference
+    """
+    groups = cell_stats(cells, measure)
+    control = groups.get('Control', GroupStats())
+    treatment = groups.get('Treatment', GroupStats())
+    result = t_test(control, treatment, equal_var, alpha)
+    result['power'] = power(control, treatment, equal_var=equal_var, alpha=alpha)
+    return result
@@ -0,0 +1,504 @@
+"""
+Trip Data Engine for Driver Profitability Dashboard
+
+Generates trip data, prices trips, calculates driver expenses and reads and
+writes trip data files. Both the dashboard (app.py) and the data generator CLI
+(data_generator.py) are built on this module.
+"""
+
+import pandas as pd
+import numpy as np
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Define zones and their characteristics
+ZONES = {
+    'Downtown': {'base_fare': 15, 'demand_factor': 1.2, 'surge_multiplier': 1.3},
+    'Etobicoke': {'base_fare': 12, 'demand_factor': 0.8, 'surge_multiplier': 1.1},
+    'North York': {'base_fare': 14, 'demand_factor': 1.0, 'surge_multiplier': 1.2},
+    'Scarborough': {'base_fare': 13, 'demand_factor': 0.9, 'surge_multiplier': 1.0},
+    'Mississauga': {'base_fare': 11, 'demand_factor': 0.7, 'surge_multiplier': 0.9},
+    'Brampton': {'base_fare': 10, 'demand_factor': 0.6, 'surge_multiplier': 0.8}
+}
+DRIVER_TYPES = ['Full-time', 'Part-time']
+AB_GROUPS = ['Control', 'Treatment']
+
+# Trips per shard. Shards are fixed-size with their own child seed, so the data
+# depends only on the seed and trip count, never on how many workers ran them
+SHARD_TRIPS = 1_000_000
+
+class PricingModel:
+    """
+    Fare and driver payout for a batch of trips
+    
+    The fare is the pickup zone's base fare plus per-km and per-minute rates,
+    optionally times the zone's surge multiplier, with uniform noise. The
+    driver's share of the fare is drawn uniformly, plus optional bonuses for
+    the Treatment A/B group and full-time drivers. Subclass and override
+    price() for other pricing schemes.
+    
+    Args:
+        per_km (float): Fare per kilometre
+        per_min (float): Fare per minute
+        surge (bool): Apply the pickup zone's surge multiplier
+        fare_noise (tuple): Range of the uniform fare multiplier
+        payout_share (tuple): Range of the driver's uniform share of the fare
+        treatment_bonus (float): Extra payout share for the Treatment group
+        full_time_bonus (float): Extra payout share for full-time drivers
+    """
+    
+    def __init__(self, per_km=1.5, per_min=0.3, surge=False, fare_noise=(0.9, 1.1),
+                 payout_share=(0.7, 0.8), treatment_bonus=0.0, full_time_bonus=0.0):
+        self.per_km = per_km
+        self.per_min = per_min
+        self.surge = surge
+        self.fare_noise = fare_noise
+        self.payout_share = payout_share
+        self.treatment_bonus = treatment_bonus
+        self.full_time_bonus = full_time_bonus
+    
+    def price(self, trips, rng):
+        """
+        Price a batch of trips
+        
+        Args:
+            trips (pd.DataFrame): Trips with pickup_zone, trip_distance_km,
+                trip_duration_min, driver_type and ab_group
+            rng (np.random.Generator): Random generator for the noise
+        
+        Returns:
+            tuple: (fare, driver payout) as unrounded float arrays
+        """
+        n_trips = len(trips)
+        zone_codes = trips['pickup_zone'].cat.codes.to_numpy()
+        zone_names = trips['pickup_zone'].cat.categories
+        base_fares = np.array([ZONES[z]['base_fare'] for z in zone_names], dtype=float)
+        fares = (base_fares[zone_codes]
+                 + trips['trip_distance_km'].to_numpy(dtype=float) * self.per_km
+                 + trips['trip_duration_min'].to_numpy(dtype=float) * self.per_min)
+        if self.surge:
+            surge = np.array([ZONES[z]['surge_multiplier'] for z in zone_names])
+            fares *= surge[zone_codes]
+        fares *= rng.uniform(*self.fare_noise, n_trips)
+        
+        share = rng.uniform(*self.payout_share, n_trips)
+        share += np.where((trips['ab_group'] == 'Treatment').to_numpy(), self.treatment_bonus, 0.0)
+        share += np.where((trips['driver_type'] == 'Full-time').to_numpy(), self.full_time_bonus, 0.0)
+        return fares, fares * share
+
+# Flat pricing used by the data generator CLI, and the dashboard's pricing with
+# zone surge and payout bonuses for the Treatment group and full-time drivers
+STANDARD_PRICING = PricingModel()
+SURGE_PRICING = PricingModel(surge=True, fare_noise=(0.95, 1.05), treatment_bonus=0.05,
+                             full_time_bonus=0.03)
+PRICING_MODELS = {'standard': STANDARD_PRICING, 'surge': SURGE_PRICING}
+
+def generate_trip_data(n_trips=1000, random_seed=42, workers=1, pricing=STANDARD_PRICING):
+    """
+    Generate realistic trip data for analysis
+    
+    Trips are generated in fixed-size shards (see trip_shards), optionally in
+    parallel; the result is the same for any number of workers.
+    
+    Args:
+        n_trips (int): Number of trips to generate
+        random_seed (int): Seed for the random number generator
+        workers (int): Number of processes generating shards
+        pricing (PricingModel): Pricing model for fares and payouts
+    
+    Returns:
+        pd.DataFrame: Generated trip data
+    """
+    
+    shards = [shard + (pricing,) for shard in trip_shards(n_trips, random_seed)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(_generate_shard_task, shards))
+    else:
+        frames = [_generate_shard_task(shard) for shard in shards]
+    return pd.concat(frames, ignore_index=True)
+
+def trip_shards(n_trips, random_seed=42, shard_trips=SHARD_TRIPS):
+    """
+    Split a trip count into fixed-size shards with independent seeds
+    
+    Args:
+        n_trips (int): Number of trips to generate
+        random_seed (int): Root seed; shard i uses its i-th spawned child
+        shard_trips (int): Trips per shard
+    
+    Returns:
+        list: (start, stop, SeedSequence) per shard
+    """
+    n_shards = max(1, -(-n_trips // shard_trips))
+    seeds = np.random.SeedSequence(random_seed).spawn(n_shards)
+    return [(i * shard_trips, min((i + 1) * shard_trips, n_trips), seed)
+            for i, seed in enumerate(seeds)]
+
+def generate_shard(start, stop, seed, pricing=STANDARD_PRICING):
+    """
+    Generate trips start+1..stop with their own random generator
+    
+    Every column is drawn array-wide in one pass, so the cost is a handful of
+    numpy operations per column rather than Python work per trip.
+    
+    Args:
+        start (int): Number of trips in earlier shards
+        stop (int): Number of trips up to and including this shard
+        seed (SeedSequence or int): Seed for this shard's generator
+        pricing (PricingModel): Pricing model for fares and payouts
+    
+    Returns:
+        pd.DataFrame: Generated trip data for the shard
+    """
+    
+    n_trips = stop - start
+    
+    # Zone lookups as arrays indexed by zone code
+    zone_names = list(ZONES.keys())
+    demand_factors = np.array([ZONES[z]['demand_factor'] for z in zone_names])
+    
+    # Generate trip data
+    rng = np.random.default_rng(seed)
+    
+    # Integer IDs: trip_id is the trip number, driver_id the 4-digit driver number
+    trip_ids = np.arange(start + 1, stop + 1, dtype=np.int32)
+    driver_ids = rng.integers(1000, 9999, n_trips, dtype=np.int16)
+    
+    # Generate pickup and dropoff zones as zone codes
+    pickup_codes = rng.choice(len(zone_names), n_trips, p=[0.3, 0.15, 0.2, 0.15, 0.1, 0.1]).astype(np.int8)
+    dropoff_codes = rng.choice(len(zone_names), n_trips, p=[0.25, 0.2, 0.2, 0.15, 0.1, 0.1]).astype(np.int8)
+    
+    # Generate trip characteristics
+    trip_distances = rng.exponential(8, n_trips) + 1  # 1-30 km range
+    trip_durations = trip_distances * rng.uniform(2, 4, n_trips)  # 2-4 min per km
+    
+    # Generate timestamps across a week: minute offsets from 06:00 on day one
+    offsets = (rng.integers(0, 7, n_trips) * 24 * 60
+               + rng.integers(0, 24, n_trips) * 60
+               + rng.integers(0, 60, n_trips))
+    pickup_times = np.datetime64('2024-01-01T06:00', 'm') + offsets.astype('timedelta64[m]')
+    hours = (6 + offsets // 60) % 24
+    
+    # Driver types and A/B groups
+    driver_types = (rng.random(n_trips) >= 0.6).astype(np.int8)
+    ab_groups = (rng.random(n_trips) >= 0.5).astype(np.int8)
+    
+    # Create DataFrame with compact dtypes: categoricals over fixed category
+    # lists, measurements as float32
+    df = pd.DataFrame({
+        'trip_id': trip_ids,
+        'driver_id': driver_ids,
+        'pickup_zone': pd.Categorical.from_codes(pickup_codes, categories=zone_names),
+        'dropoff_zone': pd.Categorical.from_codes(dropoff_codes, categories=zone_names),
+        'trip_distance_km': trip_distances.astype(np.float32),
+        'trip_duration_min': trip_durations.astype(np.float32),
+        'pickup_time': pickup_times.astype('datetime64[us]'),
+        'driver_type': pd.Categorical.from_codes(driver_types, categories=DRIVER_TYPES),
+        'ab_group': pd.Categorical.from_codes(ab_groups, categories=AB_GROUPS)
+    })
+    
+    # Fares and driver payouts from the pricing model
+    fares, payouts = pricing.price(df, rng)
+    
+    # Generate wait times (higher during off-peak hours and low-demand zones)
+    time_factor = np.where((hours < 6) | (hours > 22), 1.5, 1.0)
+    zone_factor = np.where(demand_factors[pickup_codes] < 0.9, 1.5, 1.0)
+    wait_times = rng.exponential(3, n_trips) * time_factor * zone_factor
+    
+    # Generate cancellations (rare)
+    cancellations = rng.random(n_trips) < 0.05
+    
+    df.insert(7, 'fare_amount', np.round(fares, 2).astype(np.float32))
+    df.insert(8, 'driver_payout', np.round(payouts, 2).astype(np.float32))
+    df.insert(9, 'wait_time_min', np.round(wait_times, 1).astype(np.float32))
+    df.insert(10, 'cancellation', cancellations)
+    
+    # Calculate additional metrics
+    df = calculate_driver_expenses(df)
+    
+    return df
+
+def _generate_shard_task(shard):
+    return generate_shard(*shard)
+
+def calculate_driver_expenses(df, unprofitable_share=0.0, gas_per_km=0.12, time_per_min=0.25,
+                              wait_per_min=0.20, random_seed=None):
+    """
+    Calculate driver expenses and net earnings
+    
+    Adds the expense columns to df in place.
+    
+    Args:
+        df (pd.DataFrame): Trip data
+        unprofitable_share (float): Share of trips (at least one, if positive)
+            whose net earnings are overridden with a loss of $1-$10
+        gas_per_km (float): Gas cost per km driven
+        time_per_min (float): Time cost per minute of trip
+        wait_per_min (float): Cost per minute of waiting for the rider
+        random_seed (int): Seed for picking the unprofitable trips; None draws
+            different trips on every call
+    
+    Returns:
+        pd.DataFrame: Data with expense calculations
+    """
+    
+    # Gas cost
+    df['gas_cost'] = df['trip_distance_km'] * gas_per_km
+    
+    # Time cost
+    df['time_cost'] = df['trip_duration_min'] * time_per_min
+    
+    # Wait cost
+    df['wait_cost'] = df['wait_time_min'] * wait_per_min
+    
+    # Total expenses
+    df['total_expenses'] = df['gas_cost'] + df['time_cost'] + df['wait_cost']
+    
+    # Net earnings
+    df['net_earnings'] = df['driver_payout'] - df['total_expenses']
+    
+    # Profitability ratio
+    df['profitability_ratio'] = df['net_earnings'] / df['trip_duration_min']
+    
+    # Inject unprofitable trips
+    if unprofitable_share > 0:
+        rng = np.random.default_rng(random_seed)
+        n_unprofitable = max(1, int(unprofitable_share * len(df)))
+        unprofitable_indices = df.index[rng.choice(len(df), n_unprofitable, replace=False)]
+        df.loc[unprofitable_indices, 'net_earnings'] = -np.abs(rng.uniform(1, 10, n_unprofitable)).astype(df['net_earnings'].dtype)
+        df.loc[unprofitable_indices, 'profitability_ratio'] = df.loc[unprofitable_indices, 'net_earnings'] / df.loc[unprofitable_indices, 'trip_duration_min']
+    
+    return df
+
+FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+# Schema metadata key holding the (pickup_zone, day, rows) of every row group
+# (Parquet) or record batch (Feather), in file order
+PARTITIONS_KEY = b'trip_partitions'
+
+def trip_format(path, format=None):
+    """
+    Resolve the file format from an explicit format or the path extension
+    
+    Args:
+        path (str): File path
+        format (str): Optional 'csv', 'parquet' or 'feather'
+    
+    Returns:
+        str: The file format; CSV unless the extension says otherwise
+    """
+    if format is not None:
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format: {format}")
+        return format
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.arrow':
+        return 'feather'
+    return next((f for f, e in FORMATS.items() if e == ext), 'csv')
+
+def write_trip_file(df, path, format=None):
+    """
+    Write trip data as CSV, Parquet or Feather (Arrow IPC)
+    
+    Parquet and Feather files are sorted into one row group / record batch per
+    (pickup_zone, day) partition, with the partition list stored in the schema
+    metadata so load_trip_data can read only the partitions it needs.
+    
+    Args:
+        df (pd.DataFrame): Trip data
+        path (str): Output file path
+        format (str): Optional format; inferred from the extension if omitted
+    """
+    format = trip_format(path, format)
+    if format == 'csv':
+        df.to_csv(path, index=False)
+        return
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    # Sort rows by (zone, day) and find where each partition starts
+    zone_codes = df['pickup_zone'].cat.codes.to_numpy().astype(np.int64)
+    days = df['pickup_time'].to_numpy().astype('datetime64[D]')
+    key = zone_codes * (1 << 32) + days.astype(np.int64)
+    order = np.argsort(key, kind='stable')
+    _, starts = np.unique(key[order], return_index=True)
+    stops = np.append(starts[1:], len(df))
+    zone_names = df['pickup_zone'].cat.categories
+    partitions = [[str(zone_names[zone_codes[order[s]]]), str(days[order[s]]), int(e - s)]
+                  for s, e in zip(starts, stops)]
+    
+    table = pa.Table.from_pandas(df.iloc[order], preserve_index=False).combine_chunks()
+    schema = table.schema.with_metadata({**table.schema.metadata,
+                                         PARTITIONS_KEY: json.dumps(partitions).encode()})
+    table = table.replace_schema_metadata(schema.metadata)
+    if format == 'parquet':
+        writer = pq.ParquetWriter(path, schema)
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    try:
+        for s, e in zip(starts, stops):
+            part = table.slice(s, e - s)
+            if format == 'parquet':
+                writer.write_table(part, row_group_size=max(int(e - s), 1))
+            else:
+                for batch in part.to_batches(max_chunksize=None):
+                    writer.write_batch(batch)
+    finally:
+        writer.close()
+
+def trip_schema(path):
+    """
+    Read the Arrow schema of a Parquet or Feather trip file
+    
+    Only the file footer is read, not the data.
+    
+    Args:
+        path (str): Parquet or Feather file written by write_trip_file
+    
+    Returns:
+        pyarrow.Schema: Column names, types and metadata
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if trip_format(path) == 'parquet':
+        return pq.read_schema(path)
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema
+
+def trip_files(path):
+    """
+    Expand a trip data path into the files it names
+    
+    A directory or glob pattern (e.g. 'trips-*.feather') names every matching
+    trip file in sorted order, so the shard files of write_trip_shards can be
+    read as one dataset.
+    
+    Args:
+        path (str): File, directory or glob pattern
+    
+    Returns:
+        list: Paths of the files; empty if nothing matches
+    """
+    if os.path.isdir(path):
+        return sorted(f for f in glob.glob(os.path.join(path, '*'))
+                      if os.path.splitext(f)[1].lower() in ('.arrow', *FORMATS.values()))
+    if any(c in path for c in '*?['):
+        return sorted(glob.glob(path))
+    return [path] if os.path.exists(path) else []
+
+def trip_partitions(path):
+    """
+    List the (pickup_zone, day) partitions of Parquet or Feather trip data
+    
+    Args:
+        path (str): File written by write_trip_file, or a directory or glob
+            pattern of such files
+    
+    Returns:
+        pd.DataFrame: pickup_zone, day and rows per partition, in file order
+    """
+    partitions = [p for f in trip_files(path) for p in json.loads(trip_schema(f).metadata[PARTITIONS_KEY])]
+    return pd.DataFrame(partitions, columns=['pickup_zone', 'day', 'rows'])
+
+def _load_trip_csv(path, columns, zones, days):
+    usecols = None if columns is None else list(dict.fromkeys(
+        list(columns) + [c for c, v in (('pickup_zone', zones), ('pickup_time', days)) if v is not None]))
+    df = pd.read_csv(path, usecols=usecols)
+    if 'pickup_time' in df:
+        df['pickup_time'] = pd.to_datetime(df['pickup_time'])
+    keep = np.ones(len(df), dtype=bool)
+    if zones is not None:
+        keep &= df['pickup_zone'].isin(zones).to_numpy()
+    if days is not None:
+        keep &= df['pickup_time'].dt.strftime('%Y-%m-%d').isin(days).to_numpy()
+    df = df[keep].reset_index(drop=True)
+    return df if columns is None else df[list(columns)]
+
+def _read_trip_table(path, columns, zones, days):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    partitions = trip_partitions(path)
+    keep = np.ones(len(partitions), dtype=bool)
+    if zones is not None:
+        keep &= partitions['pickup_zone'].isin(zones).to_numpy()
+    if days is not None:
+        keep &= partitions['day'].isin(days).to_numpy()
+    selected = np.flatnonzero(keep).tolist()
+    columns = None if columns is None else list(columns)
+    if trip_format(path) == 'parquet':
+        return pq.ParquetFile(path, memory_map=True).read_row_groups(selected, columns=columns)
+    reader = pa.ipc.open_file(pa.memory_map(path))
+    table = pa.Table.from_batches([reader.get_batch(i) for i in selected], reader.schema)
+    return table if columns is None else table.select(columns)
+
+def load_trip_data(path, columns=None, zones=None, days=None):
+    """
+    Load trip data, reading only the requested columns and partitions
+    
+    Parquet and Feather files are memory-mapped and only the row groups or
+    record batches of the requested zones and days are read. CSV files are
+    parsed in full and filtered afterwards.
+    
+    Args:
+        path (str or list): File written by write_trip_file, a directory or
+            glob pattern of such files, or a list of files (e.g. the shards
+            returned by write_trip_shards)
+        columns (list): Optional columns to read (default: all)
+        zones (list): Optional pickup zones to keep (default: all)
+        days (list): Optional days ('YYYY-MM-DD') to keep (default: all)
+    
+    Returns:
+        pd.DataFrame: Trip data
+    """
+    files = list(path) if isinstance(path, (list, tuple)) else trip_files(path)
+    if not files:
+        raise FileNotFoundError(f"No trip data files match {path}")
+    if trip_format(files[0]) == 'csv':
+        frames = [_load_trip_csv(f, columns, zones, days) for f in files]
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    import pyarrow as pa
+    # Shards are concatenated as Arrow tables; differing zone dictionaries are
+    # unified when converting to pandas
+    return pa.concat_tables([_read_trip_table(f, columns, zones, days) for f in files]).to_pandas()
+
+def _write_shard_task(task):
+    start, stop, seed, pricing, path, format = task
+    write_trip_file(generate_shard(start, stop, seed, pricing), path, format)
+    return path
+
+def write_trip_shards(n_trips, output_file, random_seed=42, workers=1, format=None,
+                      pricing=STANDARD_PRICING):
+    """
+    Generate trips shard by shard and write one file per shard
+    
+    Shards are generated and written concurrently by the worker processes, so
+    only a few shards are ever in memory.
+    
+    The files depend only on the trip count and seed: a single shard is
+    written to output_file itself, and several shards go to one file each.
+    
+    Args:
+        n_trips (int): Number of trips to generate
+        output_file (str): Output path; with more than one shard, shard i is
+            written to <stem>-<i>.<ext> instead
+        random_seed (int): Seed for the random number generator
+        workers (int): Number of processes generating and writing shards
+        format (str): Optional format; inferred from the extension if omitted
+        pricing (PricingModel): Pricing model for fares and payouts
+    
+    Returns:
+        list: Paths of the shard files in trip order
+    """
+    format = trip_format(output_file, format)
+    stem, ext = os.path.splitext(output_file)
+    shards = trip_shards(n_trips, random_seed)
+    paths = ([output_file] if len(shards) == 1 else
+             [f"{stem}-{i:05d}{ext or FORMATS[format]}" for i in range(len(shards))])
+    tasks = [(start, stop, seed, pricing, path, format) for (start, stop, seed), path in zip(shards, paths)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_write_shard_task, tasks))
+    return [_write_shard_task(task) for task in tasks]
@@ -0,0 +1,117 @@
+"""
+Derived Trip Features for Driver Profitability Dashboard
+
+Expense columns, net earnings and trip buckets are derived from a trip frame
+once per (dataset, cost parameters) key and kept in a bounded LRU cache. Callers
+get read-only views of the cached frame, so reruns neither recompute the
+columns nor see them change underneath them, and the unprofitable trips are
+drawn from a fixed seed instead of afresh on every call.
+"""
+
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from trip_engine import calculate_driver_expenses
+from trip_cube import trip_buckets
+
+# Cost parameters of the dashboard's expense calculation
+EXPENSE_PARAMS = {'unprofitable_share': 0.02, 'gas_per_km': 0.12, 'time_per_min': 0.25,
+                  'wait_per_min': 0.20, 'random_seed': 42}
+
+def derive_features(df, **params):
+    """
+    Trip data with expense columns and trip buckets, leaving df untouched
+
+    Args:
+        df (pd.DataFrame): Trip data
+        **params: Keyword arguments for trip_engine.calculate_driver_expenses
+
+    Returns:
+        pd.DataFrame: New frame with the derived columns
+    """
+    features = calculate_driver_expenses(df.copy(), **params)
+    features['trip_bucket'] = trip_buckets(features['trip_distance_km'])
+    return features
+
+def read_only(df):
+    """
+    View of a frame whose numpy-backed columns cannot be written through
+
+    The view shares memory with df. Adding or replacing columns on it is
+    allowed and only affects the view; writing into its values raises.
+
+    Args:
+        df (pd.DataFrame): Frame to protect
+
+    Returns:
+        pd.DataFrame: Read-only view
+    """
+    columns = {}
+    for name, column in df.items():
+        values = column.array
+        if isinstance(column.dtype, np.dtype):
+            values = column.to_numpy().view()
+            values.flags.writeable = False
+        columns[name] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+class FeatureCache:
+    """
+    Bounded LRU cache of derived trip features
+
+    The cache is thread-safe, so one instance can be shared across Streamlit
+    sessions.
+
+    Args:
+        maxsize (int): Number of (dataset, cost parameters) entries to keep
+    """
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, dataset_key, load, **params):
+        """
+        Derived features of a dataset, computed on the first request only
+
+        Args:
+            dataset_key (hashable): Identifies the dataset, e.g. the generator
+                arguments or a file path, mtime and zone
+            load (callable): Returns the dataset's trip frame; only called on
+                a cache miss
+            **params: Cost parameters for derive_features (default
+                EXPENSE_PARAMS)
+
+        Returns:
+            pd.DataFrame: Read-only view of the cached features
+        """
+        params = {**EXPENSE_PARAMS, **params}
+        key = (dataset_key, tuple(sorted(params.items())))
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return read_only(self._entries[key])
+            self.misses += 1
+        # Derived outside the lock so other sessions are not blocked meanwhile
+        features = read_only(derive_features(load(), **params))
+        with self._lock:
+            self._entries[key] = features
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return read_only(features)
+
+    def clear(self):
+        """
+        Drop every cached entry
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
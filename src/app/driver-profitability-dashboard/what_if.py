@@ -0,0 +1,160 @@
+"""
+What-If Expense Sweeps for Driver Profitability Dashboard
+
+Evaluates grids of driver cost rates (gas per km, time per minute and wait per
+minute) against the same trips. Mean net earnings and net earnings per minute
+are linear in the rates, so every scenario's group means come from one matrix
+product with the per-group mean distance, duration and wait time. The share of
+profitable trips needs every trip under every scenario and is computed over
+chunks of trips, so memory stays bounded however large the grid is.
+"""
+
+import numpy as np
+import pandas as pd
+from trip_cube import dim_codes
+from trip_features import EXPENSE_PARAMS
+
+RATES = ['gas_per_km', 'time_per_min', 'wait_per_min']
+# Trip column each rate is charged on
+RATE_COLUMNS = {'gas_per_km': 'trip_distance_km', 'time_per_min': 'trip_duration_min',
+                'wait_per_min': 'wait_time_min'}
+DEFAULT_RATES = {rate: EXPENSE_PARAMS[rate] for rate in RATES}
+WHAT_IF_DIMS = ['pickup_zone', 'hour']
+
+def cost_grid(**rates):
+    """
+    Every combination of the given cost rates
+
+    Args:
+        **rates: Rate name (see RATES) to a value or list of values; rates not
+            given stay at DEFAULT_RATES
+
+    Returns:
+        pd.DataFrame: One scenario per row, with a column per rate
+    """
+    values = [np.atleast_1d(rates.get(rate, DEFAULT_RATES[rate])) for rate in RATES]
+    grid = np.meshgrid(*values, indexing='ij')
+    return pd.DataFrame({rate: g.ravel() for rate, g in zip(RATES, grid)}).rename_axis('scenario')
+
+def _take(values, rows):
+    return values if rows is None else values[rows]
+
+def _selected_codes(frames, selections, dim):
+    # Codes of one dimension for the selected trips of every frame, against the
+    # union of the frames' levels
+    parts = [dim_codes(frame, dim) for frame in frames]
+    levels = parts[0][1]
+    if dim != 'hour' and len(parts) > 1:
+        union = pd.Index(np.asarray(levels, dtype=object))
+        for _, other in parts[1:]:
+            union = union.append(pd.Index(np.asarray(other, dtype=object)).difference(union, sort=False))
+        if len(union) > len(levels):
+            levels = pd.CategoricalIndex(union, categories=union, name=dim)
+    codes = []
+    for (part_codes, part_levels), rows in zip(parts, selections):
+        part_codes = _take(part_codes, rows)
+        if dim != 'hour' and part_levels is not levels and len(part_levels):
+            remap = pd.Index(np.asarray(levels, dtype=object)).get_indexer(np.asarray(part_levels, dtype=object))
+            part_codes = np.where(part_codes >= 0, remap[part_codes], -1)
+        codes.append(part_codes)
+    return np.concatenate(codes), levels
+
+def sweep(df, scenarios, by=WHAT_IF_DIMS, rows=None, chunk_bytes=8 << 20):
+    """
+    Net earnings and profitability per group under every cost scenario
+
+    Expenses are recomputed from each trip's payout, distance, duration and
+    wait time, so the dashboard's injected unprofitable trips are not part of
+    the sweep.
+
+    Args:
+        df (pd.DataFrame or list): Trip data, or several trip frames swept as one
+        scenarios (pd.DataFrame): Scenarios from cost_grid
+        by (list): Dimensions from trip_cube.CUBE_DIMS to group trips by
+        rows (np.ndarray or list): Optional boolean mask or row positions of the
+            trips to sweep, e.g. from BitmapIndex.mask (one per frame when df is
+            a list); only the selected values are read, the frames are not copied
+        chunk_bytes (int): Memory budget for the per-trip, per-scenario arrays;
+            chunks that stay in the CPU cache are the fastest
+
+    Returns:
+        pd.DataFrame: One row per scenario and non-empty group, indexed by
+            ('scenario', *by), with the scenario's rates, the trip count n, mean
+            net_earnings, mean profitability_ratio (net earnings per minute)
+            and profitable_share (share of trips with positive net earnings)
+    """
+    frames = list(df) if isinstance(df, (list, tuple)) else [df]
+    if rows is None:
+        selections = [None] * len(frames)
+    else:
+        selections = list(rows) if isinstance(df, (list, tuple)) else [rows]
+    codes, levels = zip(*[_selected_codes(frames, selections, dim) for dim in by])
+    shape = [len(level) for level in levels]
+    valid = np.logical_and.reduce([c >= 0 for c in codes])
+    groups = np.ravel_multi_index([c[valid] for c in codes], shape)
+    n_groups = int(np.prod(shape))
+
+    # Trips sorted by group, so each chunk's groups are contiguous runs
+    order = np.argsort(groups, kind='stable')
+    groups = groups[order]
+    def column(name):
+        # Selected values only, in group order
+        return np.concatenate([np.asarray(_take(frame[name].to_numpy(), r), dtype=np.float32)
+                               for frame, r in zip(frames, selections)])[valid][order]
+    payout = column('driver_payout')
+    usage = np.column_stack([column(RATE_COLUMNS[rate]) for rate in RATES])
+    duration = usage[:, RATES.index('time_per_min')]
+    rates = scenarios[RATES].to_numpy(dtype=np.float32)
+
+    # Group means of the linear measures, for all scenarios in one product
+    n = np.bincount(groups, minlength=n_groups)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        def group_mean(values):
+            return np.bincount(groups, weights=values, minlength=n_groups) / n
+        net = group_mean(payout)[:, None] - np.column_stack([group_mean(u) for u in usage.T]) @ rates.T
+        per_min = (group_mean(payout / duration)[:, None]
+                   - np.column_stack([group_mean(u / duration) for u in usage.T]) @ rates.T)
+
+    # Profitable trips per group: 4 bytes of expenses and 1 byte of flag per
+    # trip and scenario in each chunk
+    profitable = np.zeros((n_groups, len(rates)), dtype=np.int64)
+    chunk = max(1, chunk_bytes // (5 * max(len(rates), 1)))
+    for start in range(0, len(groups), chunk):
+        stop = min(start + chunk, len(groups))
+        flags = usage[start:stop] @ rates.T < payout[start:stop, None]
+        runs, run_starts = np.unique(groups[start:stop], return_index=True)
+        for group, run_start, run_stop in zip(runs, run_starts, np.append(run_starts[1:], stop - start)):
+            profitable[group] += np.count_nonzero(flags[run_start:run_stop], axis=0)
+
+    keep = np.flatnonzero(n)
+    n_scenarios = len(rates)
+    cells = pd.MultiIndex.from_product(levels, names=by)[keep]
+    result = cells[np.tile(np.arange(len(keep)), n_scenarios)].to_frame(index=False)
+    result.insert(0, 'scenario', np.repeat(scenarios.index.to_numpy(), len(keep)))
+    for rate in RATES:
+        result[rate] = np.repeat(scenarios[rate].to_numpy(), len(keep))
+    result['n'] = np.tile(n[keep], n_scenarios)
+    result['net_earnings'] = net[keep].T.ravel()
+    result['profitability_ratio'] = per_min[keep].T.ravel()
+    result['profitable_share'] = (profitable[keep] / n[keep, None]).T.ravel()
+    return result.set_index(['scenario'] + list(by))
+
+def sweep_rollup(result, by=()):
+    """
+    Combine sweep groups into coarser ones, weighting by trip count
+
+    Args:
+        result (pd.DataFrame): Output of sweep
+        by (list): Group dimensions to keep; none gives one row per scenario
+
+    Returns:
+        pd.DataFrame: Rates, n and the trip-weighted means per scenario and group
+    """
+    keys = ['scenario'] + list(by)
+    measures = ['net_earnings', 'profitability_ratio', 'profitable_share']
+    weighted = result[measures].mul(result['n'], axis=0)
+    weighted['n'] = result['n']
+    totals = weighted.groupby(level=keys, observed=True).sum()
+    totals[measures] = totals[measures].div(totals['n'], axis=0)
+    rates = result[RATES].groupby(level='scenario').first()
+    return rates.join(totals)[RATES + ['n'] + measures]
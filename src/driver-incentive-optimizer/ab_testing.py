@@ -1,5 +1,7 @@
+import numpy as np
 import pandas as pd
-from scipy.stats import ttest_ind
+from scipy.stats import t as t_dist
+from policy_simulation import PolicyAccumulator, POLICY_NAMES, accumulate
 
 def ab_test(df, policy_name):
     # Map display name to code name if needed
@@ -11,26 +13,60 @@ def ab_test(df, policy_name):
     }
     code_name = policy_map.get(policy_name, policy_name)
     # Control: no incentive, Treatment: selected policy
-    control = df[df['policy'] == 'none']
-    treatment = df[df['policy'] == code_name]
-    # Participation rate
-    control_rate = control['participated'].mean()
-    treatment_rate = treatment['participated'].mean()
-    # Fulfilled rides
-    control_rides = control['rides_fulfilled'].mean()
-    treatment_rides = treatment['rides_fulfilled'].mean()
-    # Cost per additional ride
-    cost = treatment['incentive_paid'].mean()
-    uplift = treatment_rides - control_rides
-    cost_per_additional_ride = cost / uplift if uplift > 0 else float('inf')
-    # T-test
-    tstat, pval = ttest_ind(treatment['rides_fulfilled'], control['rides_fulfilled'], equal_var=False)
+    row = ab_test_all(df).loc[code_name]
     return {
-        'control_rate': control_rate,
-        'treatment_rate': treatment_rate,
-        'control_rides': control_rides,
-        'treatment_rides': treatment_rides,
+        'control_rate': row['control_rate'],
+        'treatment_rate': row['treatment_rate'],
+        'control_rides': row['control_rides'],
+        'treatment_rides': row['treatment_rides'],
+        'cost_per_additional_ride': row['cost_per_additional_ride'],
+        'tstat': row['tstat'],
+        'pval': row['pval']
+    }
+
+def ab_test_all(df, alpha=0.05):
+    # Control-vs-treatment stats for every incentive at once, from per-policy
+    # sufficient statistics. Accepts a frame, a stream of chunks or an accumulator.
+    if isinstance(df, PolicyAccumulator):
+        acc = df
+    elif isinstance(df, pd.DataFrame):
+        acc = PolicyAccumulator().update(df)
+    else:
+        acc = accumulate(df)
+    n, mean, var = acc.n, acc.mean(), acc.var()
+    treated = [p for p in n.index if p != 'none']
+    # Without a control arm its stats are NaN, so an empty stream gives an empty
+    # table like an empty frame does
+    c_n, t_n = n.get('none', 0), n[treated].values
+    c_mean, t_mean = mean.reindex(['none']).iloc[0], mean.loc[treated]
+    c_var, t_var = var['rides_fulfilled'].get('none', np.nan), var.loc[treated, 'rides_fulfilled'].values
+
+    uplift = t_mean['rides_fulfilled'].values - c_mean['rides_fulfilled']
+    cost = t_mean['incentive_paid'].values
+    with np.errstate(divide='ignore'):
+        cost_per_additional_ride = np.where(uplift > 0, cost / uplift, np.inf)
+
+    # Welch t-test and confidence interval on the difference in rides
+    se2_t, se2_c = t_var / t_n, (c_var / c_n if c_n else np.nan)
+    se = np.sqrt(se2_t + se2_c)
+    dof = (se2_t + se2_c) ** 2 / (se2_t ** 2 / (t_n - 1) + se2_c ** 2 / (c_n - 1))
+    tstat = uplift / se
+    pval = 2 * t_dist.sf(np.abs(tstat), dof)
+    margin = t_dist.ppf(1 - alpha / 2, dof) * se
+
+    return pd.DataFrame({
+        'policy_name': [POLICY_NAMES.get(p, p) for p in treated],
+        'control_n': int(c_n),
+        'treatment_n': t_n.astype(int),
+        'control_rate': c_mean['participated'],
+        'treatment_rate': t_mean['participated'].values,
+        'control_rides': c_mean['rides_fulfilled'],
+        'treatment_rides': t_mean['rides_fulfilled'].values,
+        'uplift': uplift,
+        'uplift_ci_low': uplift - margin,
+        'uplift_ci_high': uplift + margin,
         'cost_per_additional_ride': cost_per_additional_ride,
         'tstat': tstat,
-        'pval': pval
-    } 
\ No newline at end of file
+        'dof': dof,
+        'pval': pval,
+    }, index=pd.Index(treated, name='policy'))
@@ -1,10 +1,15 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from simulate_data import simulate_driver_data
+from simulate_data import simulate_driver_data, iter_driver_data
 from policy_simulation import summarize_by_policy
-from ab_testing import ab_test
-from uplift_modeling import uplift_by_segment
+from ab_testing import ab_test_all
+from uplift_modeling import segment_stats, uplift_cube, SEGMENT_DIMS, UpliftModel, score_drivers
+from bootstrap import bootstrap_uplift
+from budget_optimizer import optimize_allocation
+from monte_carlo import run_monte_carlo, metric_bands
+from sequential_testing import SequentialMonitor, monitor_stream
 
 st.set_page_config(page_title="Uber Toronto Driver Incentive Optimization", layout="wide")
 st.title("Uber Toronto Driver Incentive Optimization Tool")
@@ -24,13 +29,48 @@ random_seed = st.sidebar.number_input("Random seed", value=42, step=1)
 def get_data(n_drivers, n_days, random_seed):
     return simulate_driver_data(n_drivers, n_days, random_seed)
 
+@st.cache_data(show_spinner=False)
+def get_summary(n_drivers, n_days, random_seed):
+    return summarize_by_policy(get_data(n_drivers, n_days, random_seed))
+
+@st.cache_data(show_spinner=False)
+def get_ab_results(n_drivers, n_days, random_seed):
+    return ab_test_all(get_data(n_drivers, n_days, random_seed))
+
+@st.cache_data(show_spinner=False)
+def get_sequential_history(n_drivers, n_days, random_seed):
+    # Streams the simulation one day at a time through an always-valid monitor
+    monitor = SequentialMonitor()
+    for _ in monitor_stream(iter_driver_data(n_drivers, n_days, random_seed), monitor):
+        pass
+    return monitor.history()
+
+@st.cache_data(show_spinner=False)
+def get_uplift_ci(n_drivers, n_days, random_seed, policy, dims, n_replicates, min_cell_size):
+    return bootstrap_uplift(get_data(n_drivers, n_days, random_seed), policy, list(dims),
+                            n_replicates=n_replicates, random_seed=random_seed,
+                            n_workers=min(4, os.cpu_count() or 1), min_cell_size=min_cell_size)
+
+@st.cache_data(show_spinner=False)
+def get_segment_stats(n_drivers, n_days, random_seed):
+    return segment_stats(get_data(n_drivers, n_days, random_seed))
+
+@st.cache_resource(show_spinner=False)
+def get_uplift_model(n_drivers, n_days, random_seed, method):
+    return UpliftModel(method).fit(get_data(n_drivers, n_days, random_seed))
+
+@st.cache_data(show_spinner=False)
+def get_driver_scores(n_drivers, n_days, random_seed, method):
+    return score_drivers(get_uplift_model(n_drivers, n_days, random_seed, method), get_data(n_drivers, n_days, random_seed))
+
 df = get_data(n_drivers, n_days, random_seed)
 
 # Tabs
-tab1, tab2, tab3, tab4 = st.tabs([
+tab1, tab2, tab3, tab_budget, tab4 = st.tabs([
     "Incentive Simulator",
     "A/B Test",
     "Uplift Analysis",
+    "Budget Optimizer",
     "Toronto Summary Report"
 ])
 
@@ -45,7 +85,7 @@ with tab1:
     - **Consecutive Trip Bonus**: Extra for completing rides back-to-back.
     - **Guaranteed Earnings**: Minimum earnings for a set period.
     """)
-    summary = summarize_by_policy(df)
+    summary = get_summary(n_drivers, n_days, random_seed)
     st.dataframe(summary.style.format({
         'participated': '{:.2%}',
         'rides_fulfilled': '{:.2f}',
@@ -58,6 +98,31 @@ with tab1:
     st.markdown("**Cost per Additional Ride by Incentive**")
     fig2 = px.bar(summary, x='policy', y='cost_per_ride', labels={'cost_per_ride':'Cost per Ride'}, text_auto='.2f')
     st.plotly_chart(fig2, use_container_width=True)
+    with st.expander("Robustness Across Random Seeds"):
+        st.write("Re-run the simulation across many seeds to see how much each result depends on the sidebar seed.")
+        n_seeds = st.slider("Number of seeds", 5, 200, 20, 5)
+        mc_key = (n_drivers, n_days, random_seed, n_seeds)
+        if st.button("Run Monte Carlo"):
+            progress = st.progress(0.0, text="Simulating seeds...")
+            metrics = run_monte_carlo(n_seeds, n_drivers, n_days, base_seed=random_seed,
+                                      n_workers=min(4, os.cpu_count() or 1),
+                                      progress_callback=lambda done, total: progress.progress(done / total, text=f"Simulated {done}/{total} seeds"))
+            st.session_state['mc_results'] = (mc_key, metric_bands(metrics))
+        if st.session_state.get('mc_results', (None,))[0] == mc_key:
+            bands = st.session_state['mc_results'][1]
+            metric = st.selectbox("Metric", ['uplift', 'participated', 'rides_fulfilled', 'cost_per_additional_ride', 'cost_per_ride', 'pval'])
+            band = bands[bands['metric'] == metric]
+            fig_mc = px.bar(band, x='policy_name', y='median',
+                            error_y=band['high'] - band['median'], error_y_minus=band['median'] - band['low'],
+                            labels={'policy_name': 'Incentive', 'median': metric})
+            st.plotly_chart(fig_mc, use_container_width=True)
+            st.caption("Bars show the median across seeds; whiskers span the 5th to 95th percentile.")
+            if metric == 'cost_per_additional_ride':
+                no_uplift = band[band['n_nonpositive_uplift'] > 0]
+                if len(no_uplift):
+                    counts = ", ".join(f"{row.policy_name} {row.n_nonpositive_uplift}/{row.n_seeds}"
+                                       for row in no_uplift.itertuples())
+                    st.caption(f"Seeds with no measurable uplift (left out of the cost bands): {counts}.")
 
 # --- A/B Test ---
 with tab2:
@@ -71,24 +136,102 @@ with tab2:
         'Consecutive Trip Bonus': 'consecutive_bonus',
         'Guaranteed Earnings': 'guaranteed_min'
     }
-    results = ab_test(df, policy_map[policy])
+    results = get_ab_results(n_drivers, n_days, random_seed).loc[policy_map[policy]]
     st.metric("Control Participation Rate", f"{results['control_rate']:.2%}", help="No incentive group")
     st.metric("Treatment Participation Rate", f"{results['treatment_rate']:.2%}", help=f"{policy} group")
     st.metric("Control Rides", f"{results['control_rides']:.2f}")
     st.metric("Treatment Rides", f"{results['treatment_rides']:.2f}")
     st.metric("Cost per Additional Ride", f"${results['cost_per_additional_ride']:.2f}")
     st.write(f"T-test p-value: {results['pval']:.4f}")
+    st.write(f"95% CI for additional rides per driver-day: [{results['uplift_ci_low']:.2f}, {results['uplift_ci_high']:.2f}]")
     st.caption("If p < 0.05, the difference is statistically significant.")
 
+    st.subheader("Sequential Monitoring")
+    st.write("Replays the test one day at a time with always-valid (mSPRT) p-values and confidence sequences, so it can be checked daily and stopped as soon as it is significant.")
+    history = get_sequential_history(n_drivers, n_days, random_seed)
+    seq = history[(history['policy'] == policy_map[policy]) & (history['metric'] == 'rides_fulfilled')]
+    if seq.empty:
+        st.info("Not enough driver-days yet for a sequential test.")
+    else:
+        fig_seq = px.line(seq, x='batch', y=['diff', 'ci_low', 'ci_high'],
+                          labels={'batch': 'Day', 'value': 'Additional rides per driver-day', 'variable': ''})
+        st.plotly_chart(fig_seq, use_container_width=True)
+        significant = seq.loc[seq['significant'], 'batch']
+        latest = seq.iloc[-1]
+        st.write(f"Always-valid p-value after day {int(latest['batch'])}: {latest['p_value']:.4f}")
+        if len(significant):
+            st.success(f"Significant from day {int(significant.iloc[0])} on.")
+        else:
+            st.caption("Not significant yet; keep monitoring.")
+
 # --- Uplift Analysis ---
 with tab3:
     st.header("Uplift Analysis by Driver Segment")
-    st.write("Estimate the treatment effect (uplift) of the selected Uber incentive by driver experience in Toronto.")
+    st.write("Estimate the treatment effect (uplift) of the selected Uber incentive by driver segment in Toronto.")
     policy2 = st.selectbox("Incentive for uplift analysis", ['Quest', 'Boost', 'Consecutive Trip Bonus', 'Guaranteed Earnings'], key='uplift')
-    uplift_df = uplift_by_segment(df, policy_map[policy2], segment_col='experience')
-    st.dataframe(uplift_df, use_container_width=True)
-    fig3 = px.bar(uplift_df, x='segment', y='uplift', labels={'uplift':'Uplift (Rides)'}, text_auto='.2f', color='segment')
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        dims = st.multiselect("Segment by", SEGMENT_DIMS, default=['experience'], key='uplift_dims')
+    with c2:
+        min_cell_size = st.number_input("Min driver-days per arm", value=30, min_value=1, step=10)
+    dims = dims or ['experience']
+    cube = uplift_cube(dims=dims, min_cell_size=min_cell_size, stats=get_segment_stats(n_drivers, n_days, random_seed))
+    uplift_df = cube[cube['policy'] == policy_map[policy2]].drop(columns=['policy', 'policy_name'])
+    uplift_df['segment'] = uplift_df[dims].astype(str).agg(' / '.join, axis=1)
+    st.dataframe(uplift_df.drop(columns=['segment']), use_container_width=True)
+    if uplift_df['masked'].any():
+        st.caption(f"{uplift_df['masked'].sum()} cells with fewer than {min_cell_size} driver-days in either arm are hidden.")
+    fig3 = px.bar(uplift_df[~uplift_df['masked']], x='segment', y='uplift', labels={'uplift':'Uplift (Rides)'}, text_auto='.2f', color=dims[0])
     st.plotly_chart(fig3, use_container_width=True)
+    st.markdown("**Bootstrap Confidence Intervals**")
+    n_replicates = st.select_slider("Bootstrap replicates", options=[200, 500, 1000, 2000, 5000, 10000], value=1000)
+    with st.spinner("Resampling..."):
+        ci_df = get_uplift_ci(n_drivers, n_days, random_seed, policy_map[policy2], tuple(dims), n_replicates, min_cell_size)
+    st.dataframe(ci_df.style.format({
+        'control': '{:.2f}', 'treatment': '{:.2f}',
+        'uplift': '{:.2f}', 'uplift_ci_low': '{:.2f}', 'uplift_ci_high': '{:.2f}',
+        'cost_per_additional_ride': '${:.2f}', 'cpar_ci_low': '${:.2f}', 'cpar_ci_high': '${:.2f}'
+    }), use_container_width=True)
+    fig_ci = px.bar(ci_df, x='segment', y='uplift', color='segment',
+                    error_y=ci_df['uplift_ci_high'] - ci_df['uplift'],
+                    error_y_minus=ci_df['uplift'] - ci_df['uplift_ci_low'],
+                    labels={'uplift':'Uplift (Rides)'})
+    st.plotly_chart(fig_ci, use_container_width=True)
+    st.caption("95% percentile bootstrap intervals for uplift and cost per additional ride, for the segments shown above.")
+    st.markdown("**Model-based Uplift per Driver**")
+    learner = st.radio("Uplift model", ['T-learner', 'X-learner'], horizontal=True, key='learner')
+    with st.spinner("Fitting uplift models..."):
+        scores = get_driver_scores(n_drivers, n_days, random_seed, 't' if learner == 'T-learner' else 'x')
+    code = policy_map[policy2]
+    fig_hte = px.histogram(scores, x=code, color='experience', nbins=40, labels={code: 'Predicted Uplift (Rides)'})
+    st.plotly_chart(fig_hte, use_container_width=True)
+    st.markdown(f"Drivers most responsive to {policy2}:")
+    st.dataframe(scores.sort_values(code, ascending=False).head(20), use_container_width=True)
+
+# --- Budget Optimizer ---
+with tab_budget:
+    st.header("Incentive Budget Optimizer")
+    st.write("Choose the incentive for each Toronto driver segment that adds the most rides within a daily incentive budget.")
+    c1, c2 = st.columns(2)
+    with c1:
+        budget = st.number_input("Daily incentive budget ($)", value=float(n_drivers), min_value=0.0, step=50.0)
+    with c2:
+        budget_dims = st.multiselect("Segment drivers by", SEGMENT_DIMS, default=['experience', 'zone'], key='budget_dims')
+    allocation = optimize_allocation(df, budget, dims=budget_dims or ['experience'])
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Planned Daily Spend", f"${allocation['total_cost'].sum():,.2f}")
+    m2.metric("Additional Rides per Day", f"{allocation['total_uplift'].sum():,.1f}")
+    m3.metric("Cost per Additional Ride", f"${allocation['total_cost'].sum() / max(allocation['total_uplift'].sum(), 1e-9):.2f}")
+    st.dataframe(allocation.style.format({
+        'uplift_per_driver': '{:.2f}',
+        'cost_per_driver': '${:.2f}',
+        'total_uplift': '{:.1f}',
+        'total_cost': '${:.2f}'
+    }), use_container_width=True)
+    drivers_by_policy = allocation.groupby('policy_name', as_index=False)['n_drivers'].sum()
+    fig_alloc = px.bar(drivers_by_policy, x='policy_name', y='n_drivers', labels={'policy_name': 'Incentive', 'n_drivers': 'Drivers'}, text_auto=True)
+    st.plotly_chart(fig_alloc, use_container_width=True)
+    st.caption("Segments with too few driver-days in either arm to measure uplift stay on no incentive.")
 
 # --- Toronto Summary Report ---
 with tab4:
@@ -0,0 +1,32 @@
+import argparse
+import time
+from simulate_data import simulate_driver_data
+
+def time_engine(engine, n_drivers, n_days, random_seed=42, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        df = simulate_driver_data(n_drivers, n_days, random_seed, engine=engine)
+        best = min(best, time.perf_counter() - start)
+    return best, len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the driver-day simulation engines')
+    parser.add_argument('--drivers', type=int, nargs='+', default=[500, 2000])
+    parser.add_argument('--days', type=int, nargs='+', default=[7, 30])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--skip-loop', action='store_true', help='Only time the vectorized engine')
+    args = parser.parse_args()
+
+    print(f"{'drivers':>8} {'days':>5} {'rows':>10} {'loop (s)':>10} {'vectorized (s)':>15} {'speedup':>8}")
+    for n_drivers in args.drivers:
+        for n_days in args.days:
+            vec_time, rows = time_engine('vectorized', n_drivers, n_days, repeats=args.repeats)
+            if args.skip_loop:
+                print(f"{n_drivers:>8} {n_days:>5} {rows:>10,} {'-':>10} {vec_time:>15.4f} {'-':>8}")
+                continue
+            loop_time, _ = time_engine('loop', n_drivers, n_days, repeats=1)
+            print(f"{n_drivers:>8} {n_days:>5} {rows:>10,} {loop_time:>10.2f} {vec_time:>15.4f} {loop_time / vec_time:>7.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from uplift_modeling import segment_keys
+
+# Replicates are drawn in fixed-size tasks, each with its own child seed, so results
+# depend only on random_seed and n_replicates, never on how many workers ran them
+TASK_REPLICATES = 250
+# Upper bound on elements in one resampling matrix (memory per block)
+BLOCK_ELEMENTS = 20_000_000
+
+def _compress(values):
+    # Distinct rows and their multiplicities; resampling the multiplicities is
+    # equivalent to resampling the rows themselves
+    unique, counts = np.unique(values, axis=0, return_counts=True)
+    return unique, counts
+
+def _bootstrap_means(unique, counts, n_replicates, rng):
+    n = counts.sum()
+    means = np.empty((n_replicates, unique.shape[1]))
+    if len(unique) * 4 <= n:
+        # Multinomial count matrix over distinct rows
+        block = max(1, BLOCK_ELEMENTS // len(unique))
+        for start in range(0, n_replicates, block):
+            stop = min(start + block, n_replicates)
+            weights = rng.multinomial(n, counts / n, size=stop - start)
+            means[start:stop] = weights @ unique / n
+    else:
+        # Little repetition: resample row indices directly
+        rows = np.repeat(unique, counts, axis=0)
+        block = max(1, BLOCK_ELEMENTS // n)
+        for start in range(0, n_replicates, block):
+            stop = min(start + block, n_replicates)
+            idx = rng.integers(0, n, size=(stop - start, n))
+            means[start:stop] = rows[idx].mean(axis=1)
+    return means
+
+def _permutation_diffs(control, treatment, n_permutations, rng):
+    # Difference in means after reshuffling arm labels: the treatment arm is a draw
+    # without replacement from the pooled distinct values
+    (c_unique, c_counts), (t_unique, t_counts) = control, treatment
+    pooled, inverse = np.unique(np.concatenate([c_unique, t_unique]), return_inverse=True)
+    pooled_counts = np.bincount(inverse, weights=np.concatenate([c_counts, t_counts])).astype(np.int64)
+    n_c, n_t = c_counts.sum(), t_counts.sum()
+    total = pooled @ pooled_counts
+    t_counts_perm = rng.multivariate_hypergeometric(pooled_counts, n_t, size=n_permutations)
+    t_sums = t_counts_perm @ pooled
+    return t_sums / n_t - (total - t_sums) / n_c
+
+def _run_task(task):
+    groups, n_replicates, n_permutations, seed = task
+    rng = np.random.default_rng(seed)
+    results = []
+    for control, treatment, perm_control, perm_treatment in groups:
+        c_means = _bootstrap_means(*control, n_replicates, rng)
+        t_means = _bootstrap_means(*treatment, n_replicates, rng)
+        perm = (_permutation_diffs(perm_control, perm_treatment, n_permutations, rng)
+                if n_permutations else np.empty(0))
+        results.append((c_means, t_means, perm))
+    return results
+
+def _tasks(groups, n_replicates, n_permutations, random_seed):
+    n_tasks = max(1, -(-max(n_replicates, n_permutations) // TASK_REPLICATES))
+    seeds = np.random.SeedSequence(random_seed).spawn(n_tasks)
+    tasks = []
+    for i, seed in enumerate(seeds):
+        reps = min(TASK_REPLICATES, max(0, n_replicates - i * TASK_REPLICATES))
+        perms = min(TASK_REPLICATES, max(0, n_permutations - i * TASK_REPLICATES))
+        tasks.append((groups, reps, perms, seed))
+    return tasks
+
+def bootstrap_uplift(df, policy_name, segment_col=None, n_replicates=1000, n_permutations=0,
+                     alpha=0.05, random_seed=0, n_workers=1, min_cell_size=2):
+    # Percentile bootstrap CIs for uplift in rides and cost per additional ride of a
+    # policy against the no-incentive control, overall or per segment, plus an
+    # optional permutation p-value for the uplift. segment_col is one column or a
+    # list of SEGMENT_DIMS, combined into 'a / b' labels as in the uplift table;
+    # segments where either arm has fewer than min_cell_size rows are left out,
+    # like the cells uplift_cube masks
+    policy_map = {
+        'Quest': 'fixed_bonus',
+        'Boost': 'peak_boost',
+        'Consecutive Trip Bonus': 'consecutive_bonus',
+        'Guaranteed Earnings': 'guaranteed_min'
+    }
+    code_name = policy_map.get(policy_name, policy_name)
+    df = df[df['policy'].isin(['none', code_name])]
+    if segment_col is None:
+        segments = pd.Series('all', index=df.index)
+    else:
+        dims = [segment_col] if isinstance(segment_col, str) else list(segment_col)
+        labels = [key.astype(str) for key in segment_keys(df, dims)]
+        segments = labels[0].str.cat(labels[1:], sep=' / ') if len(labels) > 1 else labels[0]
+
+    keys, groups, observed = [], [], []
+    for seg, seg_df in df.groupby(segments, sort=True, observed=True):
+        control = seg_df[seg_df['policy'] == 'none']
+        treatment = seg_df[seg_df['policy'] == code_name]
+        if min(len(control), len(treatment)) < max(2, min_cell_size):
+            continue
+        columns = ['rides_fulfilled', 'incentive_paid']
+        keys.append(seg)
+        groups.append((
+            _compress(control[columns].to_numpy(dtype=float)),
+            _compress(treatment[columns].to_numpy(dtype=float)),
+            _compress(control['rides_fulfilled'].to_numpy(dtype=float)),
+            _compress(treatment['rides_fulfilled'].to_numpy(dtype=float)),
+        ))
+        observed.append((control['rides_fulfilled'].mean(), treatment['rides_fulfilled'].mean(),
+                         treatment['incentive_paid'].mean()))
+
+    tasks = _tasks(groups, n_replicates, n_permutations, random_seed)
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            task_results = list(pool.map(_run_task, tasks))
+    else:
+        task_results = [_run_task(task) for task in tasks]
+
+    q = [alpha / 2, 1 - alpha / 2]
+    rows = []
+    for g, seg in enumerate(keys):
+        c_means = np.concatenate([r[g][0] for r in task_results])
+        t_means = np.concatenate([r[g][1] for r in task_results])
+        uplift_reps = t_means[:, 0] - c_means[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cpar_reps = np.where(uplift_reps > 0, t_means[:, 1] / uplift_reps, np.inf)
+        c_rides, t_rides, cost = observed[g]
+        uplift = t_rides - c_rides
+        row = {
+            'segment': seg,
+            'control': c_rides,
+            'treatment': t_rides,
+            'uplift': uplift,
+            'uplift_ci_low': np.quantile(uplift_reps, q[0], method='inverted_cdf'),
+            'uplift_ci_high': np.quantile(uplift_reps, q[1], method='inverted_cdf'),
+            'cost_per_additional_ride': cost / uplift if uplift > 0 else float('inf'),
+            'cpar_ci_low': np.quantile(cpar_reps, q[0], method='inverted_cdf'),
+            'cpar_ci_high': np.quantile(cpar_reps, q[1], method='inverted_cdf'),
+        }
+        if n_permutations:
+            perm = np.concatenate([r[g][2] for r in task_results])
+            row['perm_pval'] = (1 + np.sum(np.abs(perm) >= abs(uplift))) / (1 + len(perm))
+        rows.append(row)
+    return pd.DataFrame(rows)
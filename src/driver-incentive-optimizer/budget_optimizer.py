@@ -0,0 +1,124 @@
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+from policy_simulation import POLICY_NAMES
+from uplift_modeling import SEGMENT_DIMS, segment_keys, uplift_cube
+
+# Largest number of distinct units allocate_budget(method='lp') will solve
+LP_MAX_UNITS = 2_000
+
+def allocate_budget(gain, cost, budget, weights=None, method='greedy'):
+    # Multiple-choice knapsack: pick one option per unit (row) to maximise total
+    # weighted gain with total weighted cost <= budget. Column 0 must be a feasible
+    # zero-cost baseline; options with non-finite gain or cost are never chosen.
+    gain = np.asarray(gain, dtype=float)
+    cost = np.asarray(cost, dtype=float)
+    weights = np.ones(len(gain)) if weights is None else np.asarray(weights, dtype=float)
+    eligible = np.isfinite(gain) & np.isfinite(cost)
+    gain = np.where(eligible, gain, -np.inf)
+    cost = np.where(eligible, cost, 0.0)
+    if method == 'lp':
+        return _allocate_lp(gain, cost, budget, weights)
+    if method != 'greedy':
+        raise ValueError(f"Unknown method: {method}")
+
+    rows = np.arange(len(gain))
+    def choose(lam):
+        return np.argmax(gain - lam * cost, axis=1)
+    def spend(choice):
+        return weights @ cost[rows, choice]
+
+    choice = choose(0.0)
+    if spend(choice) > budget:
+        # Lagrangian relaxation: the largest cost multiplier that fits the budget
+        lo, hi = 0.0, 1.0
+        while spend(choose(hi)) > budget and hi < 1e12:
+            lo, hi = hi, hi * 2
+        while hi - lo > 1e-6 * hi:
+            mid = (lo + hi) / 2
+            if spend(choose(mid)) > budget:
+                lo = mid
+            else:
+                hi = mid
+        choice = choose(hi)
+
+    # Spend what is left on the best single upgrade per unit, by gain per dollar
+    remaining = budget - spend(choice)
+    d_gain = (gain - gain[rows, choice][:, None]) * weights[:, None]
+    d_cost = (cost - cost[rows, choice][:, None]) * weights[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where((d_gain > 0) & (d_cost > 0) & (d_cost <= remaining), d_gain / d_cost, -np.inf)
+    upgrade = np.argmax(ratio, axis=1)
+    best_ratio = ratio[rows, upgrade]
+    candidates = np.flatnonzero(np.isfinite(best_ratio))
+    candidates = candidates[np.argsort(-best_ratio[candidates], kind='stable')]
+    affordable = np.cumsum(d_cost[candidates, upgrade[candidates]]) <= remaining
+    taken = candidates[affordable]
+    choice[taken] = upgrade[taken]
+    return choice
+
+def _allocate_lp(gain, cost, budget, weights):
+    # LP relaxation solved with HiGHS; fractional units fall back to their cheapest
+    # option in the support so the budget still holds. Units with identical options
+    # (e.g. drivers of one segment) are solved as one unit carrying their total
+    # weight, so the LP grows with the number of distinct segments, not drivers.
+    # Meant for segment-level problems of up to LP_MAX_UNITS distinct units;
+    # larger ones are left to the greedy method, which handles 100k units in well
+    # under a second
+    # Rows compared as raw bytes, which is much faster than np.unique(axis=0)
+    rows = np.ascontiguousarray(np.hstack([gain, cost]))
+    keys = rows.view(np.dtype((np.void, rows.itemsize * rows.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    units = rows[first]
+    n_units, n_options = len(units), gain.shape[1]
+    if n_units > LP_MAX_UNITS:
+        raise ValueError(f"method='lp' supports up to {LP_MAX_UNITS:,} distinct units, got {n_units:,}; "
+                         "use method='greedy'")
+    gain, cost = units[:, :n_options], units[:, n_options:]
+    eligible = np.isfinite(gain)
+    weights = np.bincount(inverse, weights=weights, minlength=n_units)
+    c = -np.where(eligible, gain, 0.0) * weights[:, None]
+    a_eq = sparse.kron(sparse.eye(n_units), np.ones((1, n_options)), format='csr')
+    a_ub = (cost * weights[:, None]).reshape(1, -1)
+    bounds = np.column_stack([np.zeros(eligible.size), eligible.ravel().astype(float)])
+    result = linprog(c.ravel(), A_ub=a_ub, b_ub=[budget], A_eq=a_eq, b_eq=np.ones(n_units),
+                     bounds=bounds, method='highs')
+    if not result.success:
+        raise RuntimeError(f"Budget allocation LP failed: {result.message}")
+    x = result.x.reshape(n_units, n_options)
+    choice = np.argmax(x, axis=1)
+    fractional = x.max(axis=1) < 1 - 1e-9
+    if fractional.any():
+        support_cost = np.where(x[fractional] > 1e-9, cost[fractional], np.inf)
+        choice[fractional] = np.argmin(support_cost, axis=1)
+    return choice[inverse]
+
+def optimize_allocation(df, budget, dims=SEGMENT_DIMS, min_cell_size=30, method='greedy'):
+    # Best incentive per driver segment under a daily budget. Gain is the segment's
+    # uplift in rides per driver-day, cost its mean incentive paid per driver-day;
+    # segments with fewer than min_cell_size driver-days in either arm (see
+    # uplift_cube) stay on no incentive.
+    dims = list(dims)
+    uplift = uplift_cube(df, dims, min_cell_size)
+    payout = uplift_cube(df, dims, 1, metric='incentive_paid')
+    gain = uplift.set_index(dims + ['policy'])['uplift'].unstack('policy')
+    cost = payout.set_index(dims + ['policy'])['treatment'].unstack('policy').reindex_like(gain)
+    drivers = df.drop_duplicates('driver_id')
+    n_drivers = drivers.groupby(segment_keys(drivers, dims), observed=True).size()
+    n_drivers = n_drivers.reindex(gain.index, fill_value=0).to_numpy()
+
+    policies = ['none'] + list(gain.columns)
+    gain_matrix = np.column_stack([np.zeros(len(gain)), gain.to_numpy()])
+    cost_matrix = np.column_stack([np.zeros(len(gain)), cost.to_numpy()])
+    choice = allocate_budget(gain_matrix, cost_matrix, budget, n_drivers, method)
+
+    rows = np.arange(len(gain))
+    allocation = gain.index.to_frame(index=False)
+    allocation['n_drivers'] = n_drivers
+    allocation['policy'] = np.array(policies)[choice]
+    allocation['policy_name'] = allocation['policy'].map(POLICY_NAMES)
+    allocation['uplift_per_driver'] = gain_matrix[rows, choice]
+    allocation['cost_per_driver'] = cost_matrix[rows, choice]
+    allocation['total_uplift'] = allocation['uplift_per_driver'] * n_drivers
+    allocation['total_cost'] = allocation['cost_per_driver'] * n_drivers
+    return allocation
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from simulate_data import iter_driver_data
+from policy_simulation import accumulate, POLICY_NAMES
+from ab_testing import ab_test_all
+
+SUMMARY_METRICS = ['participated', 'rides_fulfilled', 'incentive_paid', 'cost_per_ride']
+AB_METRICS = ['uplift', 'cost_per_additional_ride', 'pval']
+
+def run_seed(n_drivers, n_days, random_seed, chunk_days=1):
+    # One simulation streamed through an accumulator; only per-policy metrics (long
+    # format) leave the worker, never the driver-day frame
+    acc = accumulate(iter_driver_data(n_drivers, n_days, random_seed, chunk_days))
+    summary = acc.summary()
+    summary['policy'] = acc.n.index
+    ab = ab_test_all(acc).reset_index()
+    metrics = pd.concat([
+        summary.melt(id_vars='policy', value_vars=SUMMARY_METRICS, var_name='metric'),
+        ab.melt(id_vars='policy', value_vars=AB_METRICS, var_name='metric'),
+    ], ignore_index=True)
+    metrics['seed'] = random_seed
+    return metrics
+
+def _run_seed_task(args):
+    return run_seed(*args)
+
+def run_monte_carlo(n_seeds=20, n_drivers=500, n_days=7, base_seed=0, n_workers=1,
+                    chunk_days=1, progress_callback=None):
+    # Runs simulate + summarize + A/B for seeds base_seed..base_seed+n_seeds-1 in
+    # shared-nothing worker processes. At most 2 * n_workers seeds are in flight, so
+    # memory stays bounded however many seeds are requested. progress_callback is
+    # called as progress_callback(completed, total) after each seed.
+    tasks = [(n_drivers, n_days, base_seed + i, chunk_days) for i in range(n_seeds)]
+    results = []
+    if n_workers <= 1:
+        for task in tasks:
+            results.append(_run_seed_task(task))
+            if progress_callback:
+                progress_callback(len(results), n_seeds)
+    else:
+        pending = iter(tasks)
+        in_flight = set()
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            for task in pending:
+                in_flight.add(pool.submit(_run_seed_task, task))
+                if len(in_flight) < 2 * n_workers:
+                    continue
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.append(future.result())
+                    if progress_callback:
+                        progress_callback(len(results), n_seeds)
+            for future in _as_done(in_flight):
+                results.append(future.result())
+                if progress_callback:
+                    progress_callback(len(results), n_seeds)
+    metrics = pd.concat(results, ignore_index=True)
+    return metrics.sort_values(['seed', 'policy', 'metric'], ignore_index=True)
+
+def _as_done(futures):
+    while futures:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        yield from done
+
+def metric_bands(metrics, lower=0.05, upper=0.95):
+    # Distribution of every (policy, metric) across seeds. Seeds without a positive
+    # uplift have an infinite cost per additional ride; they are left out of the
+    # bands and counted per policy in n_nonpositive_uplift instead
+    values = metrics['value'].replace([np.inf, -np.inf], np.nan)
+    grouped = values.groupby([metrics['policy'], metrics['metric']])
+    bands = pd.DataFrame({
+        'mean': grouped.mean(),
+        'std': grouped.std(),
+        'low': grouped.quantile(lower),
+        'median': grouped.median(),
+        'high': grouped.quantile(upper),
+        'n_seeds': grouped.size(),
+    }).reset_index()
+    uplift = metrics[metrics['metric'] == 'uplift']
+    nonpositive = (uplift['value'] <= 0).groupby(uplift['policy']).sum()
+    bands['n_nonpositive_uplift'] = bands['policy'].map(nonpositive).fillna(0).astype(int)
+    bands.insert(1, 'policy_name', bands['policy'].map(POLICY_NAMES))
+    return bands
@@ -1,19 +1,87 @@
 import pandas as pd
 
+POLICY_NAMES = {
+    'none': 'No Incentive',
+    'fixed_bonus': 'Quest',
+    'peak_boost': 'Boost',
+    'consecutive_bonus': 'Consecutive Trip Bonus',
+    'guaranteed_min': 'Guaranteed Earnings'
+}
+METRICS = ['participated', 'rides_fulfilled', 'incentive_paid', 'churned']
+
+class PolicyAccumulator:
+    # Per-policy count, sums and sums of squares of each metric. Feed it chunks with
+    # update(), combine accumulators from other workers or later days with merge()
+    # (or +), then finalize with summary()/mean()/var(). Until the first update the
+    # stats have no rows, so an empty stream summarizes like an empty frame.
+    def __init__(self, metrics=METRICS):
+        self.metrics = list(metrics)
+        columns = ['n'] + [f'{m}_sum' for m in self.metrics] + [f'{m}_sumsq' for m in self.metrics]
+        self.stats = pd.DataFrame(columns=columns, index=pd.Index([], dtype=str, name='policy'),
+                                  dtype=float)
+
+    def update(self, chunk):
+        values = chunk[self.metrics].astype(float)
+        policy = chunk['policy']
+        part = pd.concat([
+            policy.groupby(policy, observed=True).size().rename('n'),
+            values.groupby(policy, observed=True).sum().add_suffix('_sum'),
+            (values ** 2).groupby(policy, observed=True).sum().add_suffix('_sumsq'),
+        ], axis=1)
+        part.index = part.index.astype(str)
+        self.stats = part if self.stats.empty else self.stats.add(part, fill_value=0)
+        return self
+
+    def merge(self, other):
+        if self.metrics != other.metrics:
+            raise ValueError("Cannot merge accumulators tracking different metrics")
+        merged = PolicyAccumulator(self.metrics)
+        if self.stats.empty or other.stats.empty:
+            merged.stats = self.stats if other.stats.empty else other.stats
+        else:
+            merged.stats = self.stats.add(other.stats, fill_value=0)
+        return merged
+
+    __add__ = merge
+
+    @property
+    def n(self):
+        return self.stats['n'].sort_index()
+
+    def sum(self):
+        sums = self.stats[[f'{m}_sum' for m in self.metrics]].sort_index()
+        sums.columns = self.metrics
+        return sums
+
+    def mean(self):
+        return self.sum().div(self.n, axis=0)
+
+    def var(self, ddof=1):
+        sumsq = self.stats[[f'{m}_sumsq' for m in self.metrics]].sort_index()
+        sumsq.columns = self.metrics
+        n = self.n
+        return (sumsq - self.mean().pow(2).mul(n, axis=0)).div(n - ddof, axis=0).clip(lower=0)
+
+    def summary(self):
+        summary = self.mean()[['participated', 'rides_fulfilled', 'incentive_paid']]
+        summary['n_observations'] = self.n.astype(int)
+        summary = summary.rename_axis('policy').reset_index()
+        summary['cost_per_ride'] = summary['incentive_paid'] / summary['rides_fulfilled']
+        summary['policy'] = summary['policy'].map(POLICY_NAMES)
+        return summary
+
+def accumulate(chunks, metrics=METRICS):
+    acc = PolicyAccumulator(metrics)
+    for chunk in chunks:
+        acc.update(chunk)
+    return acc
+
 def summarize_by_policy(df):
-    policy_names = {
-        'none': 'No Incentive',
-        'fixed_bonus': 'Quest',
-        'peak_boost': 'Boost',
-        'consecutive_bonus': 'Consecutive Trip Bonus',
-        'guaranteed_min': 'Guaranteed Earnings'
-    }
-    summary = df.groupby('policy').agg({
-        'participated': 'mean',
-        'rides_fulfilled': 'mean',
-        'incentive_paid': 'mean',
-        'driver_id': 'count'
-    }).rename(columns={'driver_id': 'n_observations'}).reset_index()
-    summary['cost_per_ride'] = summary['incentive_paid'] / summary['rides_fulfilled']
-    summary['policy'] = summary['policy'].map(policy_names)
-    return summary 
\ No newline at end of file
+    # Accepts a frame, a stream of chunks (e.g. iter_driver_data) or an accumulator
+    if isinstance(df, PolicyAccumulator):
+        acc = df
+    elif isinstance(df, pd.DataFrame):
+        acc = PolicyAccumulator().update(df)
+    else:
+        acc = accumulate(df)
+    return acc.summary()
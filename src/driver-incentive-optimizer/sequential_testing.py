@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+from policy_simulation import PolicyAccumulator, POLICY_NAMES
+
+SEQUENTIAL_METRICS = ['rides_fulfilled', 'participated']
+
+def msprt(diff, var, tau2, alpha=0.05):
+    # Normal-mixture SPRT for a difference in means: diff is the observed difference,
+    # var its sampling variance and tau2 the variance of the N(0, tau2) mixture over
+    # true effects. Returns the likelihood ratio against no effect and the radius of
+    # the (1 - alpha) confidence sequence around diff.
+    shrink = var / (var + tau2)
+    lr = np.sqrt(shrink) * np.exp(diff ** 2 * tau2 / (2 * var * (var + tau2)))
+    radius = np.sqrt(var * (var + tau2) / tau2 * (2 * np.log(1 / alpha) - np.log(shrink)))
+    return lr, radius
+
+class SequentialMonitor:
+    # Always-valid A/B monitoring of every incentive against no incentive. Chunks of
+    # driver-days (e.g. from iter_driver_data) go into a PolicyAccumulator, so an
+    # update costs one grouped pass over the chunk plus O(policies x metrics) for the
+    # tests, never a rescan of earlier chunks. p-values are running minima of 1/LR and
+    # confidence intervals running intersections, so they stay valid however often
+    # they are looked at and whenever the test is stopped.
+    #
+    # tau is the mixture standard deviation of the effect per metric (a number or a
+    # dict); by default it is tau_scale control standard deviations, fixed at the
+    # first update. Arms with fewer than min_n driver-days are not tested yet.
+    def __init__(self, metrics=SEQUENTIAL_METRICS, alpha=0.05, tau=None, tau_scale=0.1,
+                 control='none', min_n=30):
+        self.metrics = list(metrics)
+        self.alpha = alpha
+        self.tau = tau
+        self.tau_scale = tau_scale
+        self.control = control
+        self.min_n = min_n
+        self.acc = PolicyAccumulator(self.metrics)
+        self.tau2 = None
+        self.p_value = None
+        self.ci_low = None
+        self.ci_high = None
+        self.batches = 0
+        self._history = []
+
+    def update(self, chunk):
+        self.acc.update(chunk)
+        self.batches += 1
+        n = self.acc.n
+        if n.get(self.control, 0) < self.min_n:
+            return self
+        treated = [p for p in n.index if p != self.control and n[p] >= self.min_n]
+        mean, var = self.acc.mean(), self.acc.var()
+        if self.tau2 is None:
+            if self.tau is None:
+                tau = self.tau_scale * np.sqrt(var.loc[self.control])
+            else:
+                tau = pd.Series(self.tau, index=self.metrics, dtype=float)
+            self.tau2 = tau ** 2
+
+        diff = mean.loc[treated] - mean.loc[self.control]
+        diff_var = var.loc[treated].div(n[treated], axis=0) + var.loc[self.control] / n[self.control]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            lr, radius = msprt(diff, diff_var, self.tau2, self.alpha)
+            p_value = (1 / lr).clip(upper=1)
+        low, high = diff - radius, diff + radius
+        if self.p_value is None:
+            self.p_value, self.ci_low, self.ci_high = p_value, low, high
+        else:
+            # fmin/fmax align on policy and skip NaNs (zero-variance batches)
+            self.p_value = np.fmin(self.p_value, p_value)
+            self.ci_low = np.fmax(self.ci_low, low)
+            self.ci_high = np.fmin(self.ci_high, high)
+        self._diff, self._n = diff, n
+        self._history.append(self.status())
+        return self
+
+    def status(self):
+        # One row per (policy, metric) with the current estimate and always-valid
+        # p-value and confidence interval
+        if self.p_value is None:
+            return pd.DataFrame(columns=['batch', 'policy', 'policy_name', 'metric', 'control_n',
+                                         'treatment_n', 'diff', 'ci_low', 'ci_high', 'p_value',
+                                         'significant'])
+        frames = {'diff': self._diff, 'ci_low': self.ci_low, 'ci_high': self.ci_high,
+                  'p_value': self.p_value}
+        status = pd.concat({k: v.stack() for k, v in frames.items()}, axis=1)
+        status.index.names = ['policy', 'metric']
+        status = status.reset_index()
+        status.insert(0, 'batch', self.batches)
+        status.insert(2, 'policy_name', status['policy'].map(lambda p: POLICY_NAMES.get(p, p)))
+        status.insert(4, 'control_n', int(self._n[self.control]))
+        status.insert(5, 'treatment_n', self._n.reindex(status['policy']).astype(int).values)
+        status['significant'] = status['p_value'] < self.alpha
+        return status
+
+    def history(self):
+        # Status after every tested batch, for plotting how the test converged
+        if not self._history:
+            return self.status()
+        return pd.concat(self._history, ignore_index=True)
+
+def monitor_stream(chunks, monitor=None, **kwargs):
+    # Feeds chunks to a monitor (a new SequentialMonitor(**kwargs) by default) and
+    # yields its status after each one
+    monitor = monitor or SequentialMonitor(**kwargs)
+    for chunk in chunks:
+        yield monitor.update(chunk).status()
@@ -1,7 +1,160 @@
 import numpy as np
 import pandas as pd
 
-def simulate_driver_data(n_drivers=500, n_days=7, random_seed=42):
+POLICIES = ['none', 'fixed_bonus', 'peak_boost', 'consecutive_bonus', 'guaranteed_min']
+# Participation lift per policy (peak_boost uses its weekday value; weekends get 0.2)
+POLICY_LIFT = np.array([0.0, 0.15, 0.1, 0.12, 0.18])
+EXPERIENCE = ['new', 'experienced']
+ZONES = ['Downtown', 'North York', 'Scarborough', 'Etobicoke', 'Midtown']
+SHIFTS = ['part-time', 'full-time']
+# Fixed categories keep codes identical across chunks, files and seeds
+CATEGORIES = {'experience': EXPERIENCE, 'zone': ZONES, 'shift_length': SHIFTS, 'policy': POLICIES}
+
+def _poisson_cdf(lam, k_max=64):
+    # Cumulative table so rides can be drawn from uniforms with searchsorted
+    k = np.arange(1, k_max + 1)
+    pmf = np.exp(-lam) * np.concatenate(([1.0], np.cumprod(lam / k)))
+    return np.cumsum(pmf)
+
+RIDES_CDF_PARTICIPATED = _poisson_cdf(10)
+RIDES_CDF_IDLE = _poisson_cdf(2)
+
+def _draw_drivers(rng, n_drivers):
+    # Categorical attributes are drawn as codes into CATEGORIES
+    return {
+        'driver_id': np.arange(1, n_drivers+1, dtype=np.int32),
+        'experience': rng.choice(len(EXPERIENCE), size=n_drivers, p=[0.4, 0.6]).astype(np.int8),
+        'rating': np.round(rng.normal(4.7, 0.2, n_drivers), 2),
+        'zone': rng.choice(len(ZONES), size=n_drivers, p=[0.35, 0.2, 0.2, 0.15, 0.1]).astype(np.int8),
+        'shift_length': rng.choice(len(SHIFTS), size=n_drivers, p=[0.6, 0.4]).astype(np.int8),
+        'tenure_months': rng.integers(1, 61, size=n_drivers).astype(np.int8),
+        'base_earnings': rng.normal(100, 20, n_drivers),
+    }
+
+def _simulate_days(drivers, day_start, day_stop, rng):
+    n_drivers = len(drivers['driver_id'])
+    days = np.arange(day_start, day_stop)
+    n_days = len(days)
+    # Four uniforms per driver-day (policy, participation, rides, churn), drawn in
+    # day-major order so any split of the day range consumes the same stream
+    u = rng.random((n_days, n_drivers, 4))
+    policy = (u[..., 0] * len(POLICIES)).astype(np.int8)
+    weekend = (days % 7 >= 5)[:, None]
+
+    base_p = (0.3 + 0.05 * (drivers['experience'] == 0)
+              + 0.05 * (drivers['zone'] == 0)
+              + 0.07 * (drivers['shift_length'] == 1)
+              - 0.03 * (drivers['tenure_months'] < 6))
+    lift = np.where((policy == 2) & weekend, 0.2, POLICY_LIFT[policy])
+    participated = u[..., 1] < base_p + lift
+
+    rides = np.where(participated,
+                     np.searchsorted(RIDES_CDF_PARTICIPATED, u[..., 2], side='right'),
+                     np.searchsorted(RIDES_CDF_IDLE, u[..., 2], side='right'))
+
+    incentive_paid = np.select(
+        [policy == 1, policy == 2, policy == 3, policy == 4],
+        [np.where(rides >= 10, 10.0, 0.0),
+         rides * np.where(weekend, 3.0, 1.0),
+         np.where(rides >= 3, 5.0, 0.0),
+         np.maximum(0, 120 - (drivers['base_earnings'] + rides * 8))],
+        default=0.0)
+    incentive_paid = np.where(participated, incentive_paid, 0.0)
+
+    # Churn probability: base + less if participated or incentivized
+    churn_prob = (0.08 - 0.03 * participated - 0.02 * (incentive_paid > 0)
+                  + 0.04 * (drivers['tenure_months'] < 3))
+    churned = u[..., 3] < churn_prob
+
+    def categorical(col, codes):
+        return pd.Categorical.from_codes(codes, categories=CATEGORIES[col])
+
+    return pd.DataFrame({
+        'driver_id': np.tile(drivers['driver_id'], n_days),
+        'day': np.repeat(days, n_drivers).astype(np.int16),
+        'experience': categorical('experience', np.tile(drivers['experience'], n_days)),
+        'rating': np.tile(drivers['rating'], n_days).astype(np.float32),
+        'zone': categorical('zone', np.tile(drivers['zone'], n_days)),
+        'shift_length': categorical('shift_length', np.tile(drivers['shift_length'], n_days)),
+        'tenure_months': np.tile(drivers['tenure_months'], n_days),
+        'policy': categorical('policy', policy.ravel()),
+        'participated': participated.ravel().astype(np.int8),
+        'rides_fulfilled': rides.ravel().astype(np.int16),
+        'incentive_paid': incentive_paid.ravel().astype(np.float32),
+        'base_earnings': np.tile(drivers['base_earnings'], n_days).astype(np.float32),
+        'churned': churned.ravel().astype(np.int8),
+        'churn_prob': churn_prob.ravel().astype(np.float32),
+    })
+
+def memory_report(df):
+    # Bytes and dtype per column, with a total row
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str), 'bytes': usage})
+    report.loc['total'] = ['', usage.sum()]
+    report['MB'] = report['bytes'] / 1024 ** 2
+    return report
+
+def simulate_driver_data(n_drivers=500, n_days=7, random_seed=42, engine='vectorized'):
+    # engine='loop' reproduces the original per-row simulation (and its outputs,
+    # including its object/int64/float64 dtypes) exactly
+    if engine == 'loop':
+        return _simulate_driver_data_loop(n_drivers, n_days, random_seed)
+    if engine != 'vectorized':
+        raise ValueError(f"Unknown engine: {engine}")
+    rng = np.random.default_rng(random_seed)
+    drivers = _draw_drivers(rng, n_drivers)
+    return _simulate_days(drivers, 0, n_days, rng)
+
+def iter_driver_data(n_drivers=500, n_days=7, random_seed=42, chunk_days=1):
+    # Yields the simulation in blocks of chunk_days days with the same columns and
+    # dtypes as simulate_driver_data; concatenated, the blocks equal its output
+    rng = np.random.default_rng(random_seed)
+    drivers = _draw_drivers(rng, n_drivers)
+    for day_start in range(0, n_days, chunk_days):
+        yield _simulate_days(drivers, day_start, min(day_start + chunk_days, n_days), rng)
+
+def write_chunks(chunks, path, format='parquet'):
+    # Streams DataFrame chunks to a Parquet file (one row group per chunk) or an
+    # Arrow IPC file without holding more than one chunk in memory
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if format not in ('parquet', 'arrow'):
+        raise ValueError(f"Unknown format: {format}")
+    writer = None
+    n_rows = 0
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                if format == 'parquet':
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    writer = pa.ipc.new_file(path, table.schema)
+            writer.write_table(table)
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+def read_chunks(path, columns=None):
+    # Reads a file written by write_chunks back one chunk at a time
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if str(path).endswith('.parquet'):
+        parquet_file = pq.ParquetFile(path)
+        for i in range(parquet_file.num_row_groups):
+            yield parquet_file.read_row_group(i, columns=columns).to_pandas()
+    else:
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                yield batch.to_pandas()
+
+def _simulate_driver_data_loop(n_drivers=500, n_days=7, random_seed=42):
     np.random.seed(random_seed)
     driver_ids = np.arange(1, n_drivers+1)
     experience = np.random.choice(['new', 'experienced'], size=n_drivers, p=[0.4, 0.6])
@@ -71,5 +224,20 @@ def simulate_driver_data(n_drivers=500, n_days=7, random_seed=42):
     return pd.DataFrame(records)
 
 if __name__ == "__main__":
-    df = simulate_driver_data()
-    print(df.head()) 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description='Simulate driver-day incentive data')
+    parser.add_argument('--drivers', type=int, default=500)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-days', type=int, default=1)
+    parser.add_argument('--output', type=str, help='Stream the simulation to a .parquet or .arrow file')
+    args = parser.parse_args()
+    if args.output:
+        fmt = 'parquet' if args.output.endswith('.parquet') else 'arrow'
+        chunks = iter_driver_data(args.drivers, args.days, args.seed, args.chunk_days)
+        n_rows = write_chunks(chunks, args.output, format=fmt)
+        print(f"Wrote {n_rows:,} driver-days to {args.output}")
+    else:
+        df = simulate_driver_data(args.drivers, args.days, args.seed)
+        print(df.head())
+        print(memory_report(df))
@@ -1,4 +1,62 @@
+import numpy as np
 import pandas as pd
+from policy_simulation import POLICY_NAMES
+from simulate_data import ZONES
+
+SEGMENT_DIMS = ['experience', 'zone', 'shift_length', 'tenure_bucket']
+TENURE_BINS = [0, 6, 12, 24, 60]
+TENURE_LABELS = ['1-6m', '7-12m', '13-24m', '25-60m']
+
+def tenure_bucket(tenure_months):
+    return pd.cut(tenure_months, TENURE_BINS, labels=TENURE_LABELS).rename('tenure_bucket')
+
+def segment_keys(df, dims):
+    # Grouping keys for dims, deriving tenure_bucket when the frame lacks it
+    return [tenure_bucket(df['tenure_months']) if d == 'tenure_bucket' and d not in df else df[d]
+            for d in dims]
+
+def segment_stats(df, dims=SEGMENT_DIMS, metric='rides_fulfilled'):
+    # Count, sum and sum of squares of the metric for every (dims..., policy) cell in
+    # one grouped pass; any subset of dims can be rolled up from it by summing
+    keys = segment_keys(df, dims)
+    values = df[metric].astype(float)
+    keys.append(df['policy'])
+    stats = pd.DataFrame({
+        'n': values.groupby(keys, observed=True).size(),
+        'sum': values.groupby(keys, observed=True).sum(),
+        'sumsq': (values ** 2).groupby(keys, observed=True).sum(),
+    })
+    return stats
+
+def uplift_cube(df=None, dims=('experience',), min_cell_size=30, metric='rides_fulfilled', stats=None):
+    # Treatment-vs-control uplift for every policy in every cell of dims. Pass stats
+    # from segment_stats (over any superset of dims) to skip scanning df again.
+    # Cells where either arm has fewer than min_cell_size rows (driver-days; the
+    # policy is assigned per driver-day) are masked.
+    dims = list(dims)
+    if stats is None:
+        stats = segment_stats(df, dims, metric)
+    stats = stats.groupby(level=dims + ['policy'], observed=True).sum()
+    n = stats['n'].unstack('policy', fill_value=0)
+    mean = (stats['sum'] / stats['n']).unstack('policy')
+    var = ((stats['sumsq'] - stats['sum'] ** 2 / stats['n']) / (stats['n'] - 1)).unstack('policy')
+    frames = []
+    for policy in [p for p in n.columns if p != 'none']:
+        frames.append(pd.DataFrame({
+            'policy': policy,
+            'policy_name': POLICY_NAMES.get(policy, policy),
+            'control_n': n['none'],
+            'treatment_n': n[policy],
+            'control': mean['none'],
+            'treatment': mean[policy],
+            'uplift': mean[policy] - mean['none'],
+            'se': np.sqrt(var[policy] / n[policy] + var['none'] / n['none']),
+        }))
+    cube = pd.concat(frames).reset_index()
+    masked = (cube['control_n'] < min_cell_size) | (cube['treatment_n'] < min_cell_size)
+    cube.loc[masked, ['control', 'treatment', 'uplift', 'se']] = np.nan
+    cube['masked'] = masked
+    return cube
 
 def uplift_by_segment(df, policy_name, segment_col='experience'):
     policy_map = {
@@ -8,13 +66,101 @@ def uplift_by_segment(df, policy_name, segment_col='experience'):
         'Guaranteed Earnings': 'guaranteed_min'
     }
     code_name = policy_map.get(policy_name, policy_name)
-    control = df[df['policy'] == 'none']
-    treatment = df[df['policy'] == code_name]
+    cube = uplift_cube(df, [segment_col], min_cell_size=1)
+    cube = cube[cube['policy'] == code_name].set_index(segment_col)
     segments = df[segment_col].unique()
-    results = []
-    for seg in segments:
-        c = control[control[segment_col] == seg]['rides_fulfilled'].mean()
-        t = treatment[treatment[segment_col] == seg]['rides_fulfilled'].mean()
-        uplift = t - c
-        results.append({'segment': seg, 'control': c, 'treatment': t, 'uplift': uplift})
-    return pd.DataFrame(results) 
\ No newline at end of file
+    cube = cube.reindex(segments)
+    return pd.DataFrame({
+        'segment': segments,
+        'control': cube['control'].values,
+        'treatment': cube['treatment'].values,
+        'uplift': cube['uplift'].values
+    })
+
+FEATURES = (['intercept', 'new', 'rating', 'full_time', 'tenure_months', 'base_earnings']
+            + [f'zone_{z}' for z in ZONES[1:]])
+
+def driver_features(df):
+    # Design matrix over driver covariates; zone is one-hot against Downtown
+    columns = [
+        np.ones(len(df)),
+        (df['experience'] == 'new').to_numpy(),
+        df['rating'].to_numpy(),
+        (df['shift_length'] == 'full-time').to_numpy(),
+        df['tenure_months'].to_numpy(),
+        df['base_earnings'].to_numpy(),
+    ] + [(df['zone'] == z).to_numpy() for z in ZONES[1:]]
+    return np.column_stack(columns).astype(float)
+
+def _batched_lstsq(X, y, groups, n_groups, ridge=1e-6):
+    # Normal equations for every group from one sorted pass, solved as a stack
+    order = np.argsort(groups, kind='stable')
+    bounds = np.searchsorted(groups[order], np.arange(n_groups + 1))
+    k = X.shape[1]
+    XtX = np.zeros((n_groups, k, k))
+    Xty = np.zeros((n_groups, k))
+    for g in range(n_groups):
+        rows = order[bounds[g]:bounds[g + 1]]
+        Xg = X[rows]
+        XtX[g] = Xg.T @ Xg
+        Xty[g] = Xg.T @ y[rows]
+    XtX += ridge * np.eye(k) * np.maximum(XtX.trace(axis1=1, axis2=2), 1)[:, None, None] / k
+    return np.linalg.solve(XtX, Xty[..., None])[..., 0]
+
+class UpliftModel:
+    # Heterogeneous treatment effects of every incentive against no incentive.
+    # method='t' fits one linear outcome model per arm (T-learner); method='x' adds
+    # the X-learner's imputed-effect models, blended by each arm's assignment share.
+    def __init__(self, method='t', outcome='rides_fulfilled', ridge=1e-6):
+        if method not in ('t', 'x'):
+            raise ValueError(f"Unknown method: {method}")
+        self.method = method
+        self.outcome = outcome
+        self.ridge = ridge
+
+    def fit(self, df):
+        X = driver_features(df)
+        y = df[self.outcome].to_numpy(dtype=float)
+        policies, arm = np.unique(df['policy'].astype(str).to_numpy(), return_inverse=True)
+        if 'none' not in policies:
+            raise ValueError("Fitting uplift models requires a no-incentive control arm")
+        control = int(np.flatnonzero(policies == 'none')[0])
+        mu = _batched_lstsq(X, y, arm, len(policies), self.ridge)
+        self.treatments = [p for p in policies if p != 'none']
+        treated = [i for i in range(len(policies)) if i != control]
+        tau = mu[treated] - mu[control]
+
+        if self.method == 'x':
+            # Imputed effects: treated rows against the control model, control rows
+            # against each treated model; one effect model per (policy, side)
+            n = np.bincount(arm, minlength=len(policies))
+            is_control = arm == control
+            X_c, y_c = X[is_control], y[is_control]
+            d_treated = y - (X @ mu[control])
+            tau_treated = _batched_lstsq(X, d_treated, arm, len(policies), self.ridge)[treated]
+            d_control = (X_c @ mu[treated].T - y_c[:, None]).T.ravel()
+            side = np.repeat(np.arange(len(treated)), len(y_c))
+            tau_control = _batched_lstsq(np.tile(X_c, (len(treated), 1)), d_control, side,
+                                         len(treated), self.ridge)
+            share = (n[treated] / (n[treated] + n[control]))[:, None]
+            tau = share * tau_control + (1 - share) * tau_treated
+
+        self.mu = dict(zip(policies, mu))
+        self.tau = dict(zip(self.treatments, tau))
+        return self
+
+    def predict(self, df):
+        # Individual uplift in the outcome for every incentive, one column per policy
+        X = driver_features(df)
+        effects = X @ np.array([self.tau[p] for p in self.treatments]).T
+        return pd.DataFrame(effects, index=df.index, columns=self.treatments)
+
+    def coefficients(self):
+        return pd.DataFrame(self.tau, index=FEATURES).T
+
+def score_drivers(model, df):
+    # One row per driver with covariates and predicted uplift for each incentive
+    drivers = df.drop_duplicates('driver_id')[['driver_id', 'experience', 'rating', 'zone',
+                                                'shift_length', 'tenure_months', 'base_earnings']]
+    return pd.concat([drivers, model.predict(drivers)], axis=1).reset_index(drop=True)
+